@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+# blocked_by у тестовых блокировок берется из MAIN_ADMIN_ID
+os.environ.setdefault('MAIN_ADMIN_ID', '1')
+
+from bot.database import Database, TEST_USER_ID_BASE
+
+# Размеры таблицы пользователей по умолчанию
+DEFAULT_SIZES = '1000,100000,1000000'
+# Сколько состояний FSM сохраняется за одну запись (как при сбросе SQLiteStorage)
+FSM_BATCH = 50
+# Состояние и данные FSM, типичные для заявки на втором шаге
+FSM_STATE = 'UserStates:waiting_for_photo'
+FSM_DATA = {'full_name': 'Иван Петров', 'phone': '+79990001122', 'address': 'ул. Ленина, д. 5'}
+
+
+def fsm_key(user_id: int) -> str:
+    """Ключ FSM в том же формате, что у SQLiteStorage"""
+    return f'1000000:{user_id}:{user_id}:None:None:default'
+
+
+async def measure(call, calls: int, finish=None) -> dict:
+    """Вызывает call() calls раз и возвращает статистику времени выполнения.
+
+    finish - корутина, которая завершает замер (например, фиксация отложенных
+    записей); ее время входит в общее время и скорость, но не в задержки вызовов.
+    """
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(calls):
+        call_started = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - call_started)
+    if finish is not None:
+        await finish()
+    total = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'calls': calls,
+        'total_ms': round(total * 1000, 3),
+        'ops_per_s': round(calls / total, 1) if total else None,
+        'mean_us': round(sum(latencies) / calls * 1e6, 1),
+        'p50_us': round(latencies[calls // 2] * 1e6, 1),
+        'p99_us': round(latencies[min(calls - 1, int(calls * 0.99))] * 1e6, 1)
+    }
+
+
+async def bench_size(size: int, args, workdir: str) -> dict:
+    """Создает базу с size пользователями и замеряет методы Database"""
+    db = Database()
+    db.db_path = os.path.join(workdir, f'bench_{size}.db')
+    await db.connect()
+    rng = random.Random(args.seed)
+    random_id = lambda: TEST_USER_ID_BASE + rng.randrange(size)
+
+    try:
+        started = time.perf_counter()
+        await db.create_test_users(size, args.blocked_share, args.admin_share, seed=args.seed)
+        build_s = time.perf_counter() - started
+        stats = await db.get_user_stats()
+
+        new_ids = iter(range(TEST_USER_ID_BASE + size, TEST_USER_ID_BASE + size + args.calls))
+        fsm_ids = [random_id() for _ in range(args.calls)]
+        pages = max(1, size // 10)
+
+        async def add_user():
+            user_id = next(new_ids)
+            await db.add_user(user_id, f'test{user_id}', 'Иван Петров', '+79990001122')
+
+        async def update_user():
+            user_id = random_id()
+            await db.add_user(user_id, f'test{user_id}', 'Иван Петров', f'+7{rng.randrange(10 ** 10):010d}')
+
+        async def save_fsm_records():
+            await db.save_fsm_records({
+                fsm_key(random_id()): (FSM_STATE, FSM_DATA) for _ in range(FSM_BATCH)
+            })
+
+        methods = {
+            'get_user': (lambda: db.get_user(random_id()), args.calls),
+            'get_user_by_username': (lambda: db.get_user_by_username(f'test{random_id()}'), args.calls),
+            'is_user_blocked': (lambda: db.is_user_blocked(random_id()), args.calls),
+            'get_users_page': (lambda: db.get_users_page(rng.randrange(1, pages + 1), 10), args.calls),
+            'search_users': (lambda: db.search_users(rng.choice(['Иванов', 'Петр', 'Сергей С']), 10), args.calls),
+            'get_all_users': (db.get_all_users, args.bulk_calls),
+            'get_blocked_users': (db.get_blocked_users, args.bulk_calls),
+            # Записи копятся в общей транзакции, поэтому фиксация входит в замер
+            'add_user': (add_user, args.calls, db.commit),
+            'add_user_update': (update_user, args.calls, db.commit),
+            'save_fsm_records': (save_fsm_records, max(1, args.calls // FSM_BATCH), db.commit),
+            'get_fsm_record': (lambda: db.get_fsm_record(fsm_key(rng.choice(fsm_ids))), args.calls),
+        }
+        results = {}
+        for name, (call, calls, *finish) in methods.items():
+            if args.methods and name not in args.methods:
+                continue
+            results[name] = await measure(call, calls, *finish)
+    finally:
+        await db.close()
+
+    return {
+        'users': stats['total'],
+        'blocked': stats['blocked'],
+        'admins': stats['admins'],
+        'build_s': round(build_s, 3),
+        'file_mb': round(os.path.getsize(db.db_path) / 2 ** 20, 1),
+        'methods': results
+    }
+
+
+async def run(args) -> dict:
+    """Замеряет методы Database на каждом размере базы"""
+    report = {
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'seed': args.seed,
+        'sizes': {}
+    }
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for size in args.sizes:
+            print(f"Размер {size}...", file=sys.stderr)
+            report['sizes'][str(size)] = await bench_size(size, args, workdir)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер методов Database на базах разного размера')
+    parser.add_argument('--sizes', type=lambda value: [int(size) for size in value.split(',')],
+                        default=DEFAULT_SIZES, help='размеры таблицы пользователей через запятую')
+    parser.add_argument('--calls', type=int, default=2000, help='вызовов точечных методов на каждый размер')
+    parser.add_argument('--bulk-calls', type=int, default=3, help='вызовов методов, читающих всю таблицу')
+    parser.add_argument('--blocked-share', type=float, default=0.05, help='доля заблокированных пользователей')
+    parser.add_argument('--admin-share', type=float, default=0.0001, help='доля администраторов')
+    parser.add_argument('--methods', type=lambda value: value.split(','), help='замерять только эти методы')
+    parser.add_argument('--seed', type=int, default=1, help='начальное значение генератора')
+    parser.add_argument('--workdir', help='папка для временных баз (по умолчанию системная)')
+    parser.add_argument('--output', help='файл для результата в JSON (по умолчанию stdout)')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
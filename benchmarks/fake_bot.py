@@ -0,0 +1,94 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod, SendMediaGroup, GetMe
+
+# ID и имя бота в ответах поддельной сессии
+FAKE_BOT_USER = {'id': 1000000, 'is_bot': True, 'first_name': 'Load Test Bot', 'username': 'load_test_bot'}
+# Пауза в секундах, которую поддельная сессия просит выдержать при ошибке 429
+FLOOD_RETRY_AFTER = 1
+
+# Список, в который дополнительно записываются вызовы текущей задачи (и запущенных ею)
+current_calls = contextvars.ContextVar('fake_session_calls', default=None)
+
+
+class FakeSession(BaseSession):
+    """Сессия бота без сети: запоминает вызовы Bot API и отвечает правдоподобными данными.
+
+    latency - задержка каждого ответа в секундах, flood_rate - доля запросов,
+    на которые Telegram отвечает ошибкой 429 (Too Many Requests).
+    """
+
+    def __init__(self, latency: float = 0.0, flood_rate: float = 0.0, seed: int = None):
+        super().__init__()
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self._random = random.Random(seed)
+        self._message_ids = itertools.count(1)
+        # Все вызовы по порядку: (метод, чат) и отдельно ответы 429
+        self.calls = []
+        self.flood_errors = Counter()
+
+    def counts(self) -> Counter:
+        """Количество вызовов по методам Bot API"""
+        return Counter(name for name, _ in self.calls)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: int = None):
+        name = type(method).__name__
+        call = (name, getattr(method, 'chat_id', None))
+        self.calls.append(call)
+        if current_calls.get() is not None:
+            current_calls.get().append(call)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.flood_rate and self._random.random() < self.flood_rate:
+            self.flood_errors[name] += 1
+            content = {
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {FLOOD_RETRY_AFTER}',
+                'parameters': {'retry_after': FLOOD_RETRY_AFTER}
+            }
+        else:
+            content = {'ok': True, 'result': self._result(method)}
+        # Ответ разбирается так же, как настоящий ответ сервера
+        response = self.check_response(bot, method, status_code=200, content=json.dumps(content))
+        return response.result
+
+    def _result(self, method: TelegramMethod):
+        if isinstance(method, GetMe):
+            return FAKE_BOT_USER
+        if isinstance(method, SendMediaGroup):
+            return [self._message(method) for _ in method.media]
+        if method.__returning__ is bool:
+            return True
+        if getattr(method, 'chat_id', None) is None:
+            return True
+        return self._message(method)
+
+    def _message(self, method: TelegramMethod) -> dict:
+        chat_id = int(method.chat_id)
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'supergroup'},
+            'from': FAKE_BOT_USER
+        }
+        if isinstance(getattr(method, 'text', None), str):
+            message['text'] = method.text
+        return message
+
+    async def stream_content(self, url: str, headers: dict = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True):
+        # Бот не скачивает файлы, но метод обязателен для сессии
+        yield b''
+
+    async def close(self):
+        pass
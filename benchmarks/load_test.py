@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+# Настройки бота читаются при импорте, поэтому задаются до него
+os.environ.setdefault('BOT_TOKEN', '123456:LOAD-TEST')
+os.environ.setdefault('ADMIN_GROUP_ID', '-1000000000001')
+os.environ.setdefault('MAIN_ADMIN_ID', '1')
+
+from bot.app import create_bot, create_dispatcher
+from bot.broadcast import Broadcaster
+from bot.config import MAIN_ADMIN_ID
+from bot.database import Database
+from bot.digest import ComplaintDigest
+from bot.outbound import OutboundQueue
+from bot.ratelimit import TokenBucket, ChatRateLimiter
+from .fake_bot import FakeSession, current_calls
+from .updates import DEFAULT_MIX, SCENARIOS, generate_sessions, registered_users
+
+# Частота, которая на практике означает "без ограничений"
+UNLIMITED_RATE = 1e9
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Значение, ниже которого лежит заданная доля отсортированных измерений"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {
+        'updates': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0
+    }
+
+
+def parse_mix(value: str) -> dict:
+    """Разбирает доли сценариев вида complaint=0.5,admin_chat=0.5"""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'неизвестный сценарий: {name.strip()}')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+async def run(args) -> dict:
+    """Прогоняет сессии через диспетчер бота и собирает статистику"""
+    session = FakeSession(latency=args.latency, flood_rate=args.flood_rate, seed=args.seed)
+    bot = create_bot(session)
+    dp = create_dispatcher()
+    if not args.telegram_limits:
+        # Замеряется скорость обработчиков, а не лимиты Telegram
+        queue = OutboundQueue()
+        queue.bucket = TokenBucket(UNLIMITED_RATE)
+        queue.private_limiter = ChatRateLimiter(UNLIMITED_RATE)
+        queue.group_limiter = ChatRateLimiter(UNLIMITED_RATE)
+
+    db = Database()
+    db.db_path = os.path.join(args.workdir, 'load_test.db')
+    await db.connect()
+    await db.import_users(registered_users(args.users))
+    sessions = generate_sessions(
+        args.sessions, args.users, int(MAIN_ADMIN_ID),
+        mix=args.mix, broadcasts=args.broadcasts, seed=args.seed
+    )
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    # Шаги, после которых в чате пользователя не было ожидаемого вызова Bot API
+    missing_calls = defaultdict(int)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    # Обновления одного пользователя не обрабатываются одновременно, как и у живого человека
+    user_locks = defaultdict(asyncio.Lock)
+
+    async def play(scenario: str, steps: list):
+        event = steps[0][0].get('message') or steps[0][0]['callback_query']
+        user_id = event['from']['id']
+        async with semaphore, user_locks[user_id]:
+            for update, expected in steps:
+                # Вызовы этого обновления, включая запущенные им фоновые задачи
+                calls = []
+                current_calls.set(calls)
+                started = time.perf_counter()
+                try:
+                    await dp.feed_raw_update(bot, update)
+                except Exception:
+                    errors[scenario] += 1
+                else:
+                    if (expected, user_id) not in calls:
+                        errors[scenario] += 1
+                        missing_calls[scenario] += 1
+                latencies[scenario].append(time.perf_counter() - started)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(play(scenario, steps) for scenario, steps in sessions))
+        elapsed = time.perf_counter() - started
+        # Рассылки идут в фоне и в скорость обработки обновлений не входят
+        broadcast_started = time.perf_counter()
+        await Broadcaster().wait()
+        broadcast_elapsed = time.perf_counter() - broadcast_started
+    finally:
+        await Broadcaster().stop()
+        await OutboundQueue().wait_background()
+        await ComplaintDigest().stop(bot)
+        await dp.storage.close()
+        await bot.session.close()
+        await db.close()
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        'sessions': len(sessions),
+        'concurrency': args.concurrency,
+        'api_latency_ms': args.latency * 1000,
+        'flood_rate': args.flood_rate,
+        'elapsed_s': round(elapsed, 3),
+        'updates_per_s': round(len(all_latencies) / elapsed, 1) if elapsed else 0.0,
+        'errors': sum(errors.values()),
+        'missing_calls': sum(missing_calls.values()),
+        **summarize(all_latencies),
+        'scenarios': {
+            scenario: {**summarize(values), 'errors': errors[scenario], 'missing_calls': missing_calls[scenario]}
+            for scenario, values in sorted(latencies.items())
+        },
+        'broadcast_tail_s': round(broadcast_elapsed, 3),
+        'api_calls': dict(session.counts().most_common()),
+        'flood_errors': sum(session.flood_errors.values())
+    }
+
+
+def print_report(report: dict):
+    print(f"Сессий: {report['sessions']}, одновременно: {report['concurrency']}, "
+          f"задержка API: {report['api_latency_ms']:g} мс, доля 429: {report['flood_rate']:g}")
+    print(f"Обновлений: {report['updates']} за {report['elapsed_s']} с "
+          f"({report['updates_per_s']} обн/с), ошибок: {report['errors']} "
+          f"(из них без ожидаемого вызова Bot API: {report['missing_calls']})")
+    print(f"Задержка: p50 {report['p50_ms']} мс, p99 {report['p99_ms']} мс, макс. {report['max_ms']} мс")
+    print("\nСценарий        обновл.   p50, мс   p99, мс  ошибок")
+    for scenario, stats in report['scenarios'].items():
+        print(f"{scenario:<15} {stats['updates']:>7} {stats['p50_ms']:>9} {stats['p99_ms']:>9} {stats['errors']:>7}")
+    if report['broadcast_tail_s']:
+        print(f"\nЗавершение рассылок после обработки обновлений: {report['broadcast_tail_s']} с")
+    print(f"\nВызовы Bot API ({sum(report['api_calls'].values())}, из них 429: {report['flood_errors']}):")
+    for method, count in report['api_calls'].items():
+        print(f"  {method}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест обработчиков бота без обращения к Telegram')
+    parser.add_argument('--sessions', type=int, default=200, help='количество сессий пользователей')
+    parser.add_argument('--users', type=int, default=1000, help='зарегистрированных пользователей в базе')
+    parser.add_argument('--concurrency', type=int, default=50, help='сколько сессий выполняется одновременно')
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа Bot API в секундах')
+    parser.add_argument('--flood-rate', type=float, default=0.0, help='доля запросов с ответом 429')
+    parser.add_argument('--broadcasts', type=int, default=0, help='количество рассылок среди сессий')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='доли сценариев, например complaint=0.5,admin_chat=0.5')
+    parser.add_argument('--telegram-limits', action='store_true',
+                        help='соблюдать лимиты частоты Telegram в очереди отправки')
+    parser.add_argument('--seed', type=int, default=1, help='начальное значение генератора')
+    parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+    parser.add_argument('--log-level', default='ERROR', help='уровень журнала бота (в stderr)')
+    args = parser.parse_args()
+
+    logging.basicConfig(stream=sys.stderr, level=args.log_level)
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
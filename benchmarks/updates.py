@@ -0,0 +1,187 @@
+import itertools
+import random
+import time
+
+# Первый ID пользователей, которые уже есть в базе, и новых пользователей для регистрации
+REGISTERED_USER_BASE = 100000
+NEW_USER_BASE = 900000
+# Доли сценариев в нагрузке по умолчанию
+DEFAULT_MIX = {'registration': 0.2, 'complaint': 0.4, 'admin_chat': 0.3, 'paging': 0.1}
+# Сколько сообщений пользователь пишет диспетчеру в сценарии admin_chat
+CHAT_MESSAGES = 3
+
+ADDRESSES = ['ул. Ленина, д. 5', 'ул. Мира 12, кв 4', 'пр. Победы, 7к2', 'Садовая 3, подъезд 2']
+DESCRIPTIONS = [
+    'Не работает лифт второй день',
+    'Протечка на потолке в подъезде',
+    'Не горит свет на лестничной клетке',
+    'Во дворе не вывезен мусор'
+]
+NAMES = ['Иван Петров', 'Анна Смирнова', 'Сергей Кузнецов', 'Ольга Попова']
+
+
+class UpdateFactory:
+    """Формирует обновления Telegram в том виде, в котором их присылает Bot API"""
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+
+    @staticmethod
+    def user(user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': 'Test', 'username': f'user{user_id}'}
+
+    def message(self, user_id: int, text: str = None, photo: bool = False) -> dict:
+        """Сообщение пользователя в личном чате с ботом"""
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': self.user(user_id)
+        }
+        if photo:
+            file_id = next(self._file_ids)
+            message['photo'] = [
+                {'file_id': f'photo{file_id}_s', 'file_unique_id': f'p{file_id}s', 'width': 320, 'height': 240},
+                {'file_id': f'photo{file_id}', 'file_unique_id': f'p{file_id}', 'width': 1280, 'height': 960}
+            ]
+            if text:
+                message['caption'] = text
+        else:
+            message['text'] = text
+            if text.startswith('/'):
+                message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return {'update_id': next(self._update_ids), 'message': message}
+
+    def callback(self, user_id: int, data: str, message_text: str) -> dict:
+        """Нажатие inline-кнопки под сообщением бота с текстом message_text"""
+        update_id = next(self._update_ids)
+        return {
+            'update_id': update_id,
+            'callback_query': {
+                'id': str(update_id),
+                'from': self.user(user_id),
+                'chat_instance': str(user_id),
+                'data': data,
+                'message': {
+                    'message_id': next(self._message_ids),
+                    'date': int(time.time()),
+                    'chat': {'id': user_id, 'type': 'private'},
+                    'from': {'id': 1000000, 'is_bot': True, 'first_name': 'Load Test Bot'},
+                    'text': message_text
+                }
+            }
+        }
+
+
+# Сценарий - список шагов (обновление, метод Bot API). Метод обработчик должен
+# вызвать в чате пользователя, иначе шаг считается ошибкой: обработчик, который
+# не сработал, не должен выглядеть в отчете быстрым
+
+
+def registration(factory: UpdateFactory, user_id: int, rng: random.Random) -> list:
+    """Новый пользователь: /start, имя и телефон"""
+    return [
+        (factory.message(user_id, '/start'), 'SendMessage'),
+        (factory.message(user_id, rng.choice(NAMES)), 'SendMessage'),
+        (factory.message(user_id, f'+79{user_id % 10 ** 9:09d}'), 'SendMessage')
+    ]
+
+
+def complaint(factory: UpdateFactory, user_id: int, rng: random.Random) -> list:
+    """Жалоба в три шага: адрес, фото (или пропуск) и описание"""
+    steps = [
+        (factory.message(user_id, '📛Оставить заявку'), 'SendMessage'),
+        (factory.message(user_id, '📛Отправить заявку'), 'SendMessage'),
+        (factory.message(user_id, rng.choice(ADDRESSES)), 'SendMessage')
+    ]
+    if rng.random() < 0.7:
+        steps.append((factory.message(user_id, photo=True), 'SendMessage'))
+    else:
+        steps.append((factory.callback(user_id, 'skip', 'Используйте кнопки ниже:'), 'SendMessage'))
+    # Подтверждение жалобы жильцу
+    steps.append((factory.message(user_id, rng.choice(DESCRIPTIONS)), 'SendMessage'))
+    return steps
+
+
+def admin_chat(factory: UpdateFactory, user_id: int, rng: random.Random) -> list:
+    """Переписка с диспетчером: вход в чат, несколько сообщений и завершение"""
+    steps = [
+        (factory.message(user_id, '📞Связаться'), 'SendMessage'),
+        (factory.message(user_id, '📞Свяжитесь со мной в чат-боте'), 'SendMessage')
+    ]
+    for _ in range(CHAT_MESSAGES):
+        # На каждое сообщение жилец получает подтверждение
+        if rng.random() < 0.2:
+            steps.append((factory.message(user_id, rng.choice(DESCRIPTIONS), photo=True), 'SendMessage'))
+        else:
+            steps.append((factory.message(user_id, rng.choice(DESCRIPTIONS)), 'SendMessage'))
+    steps.append((factory.callback(user_id, 'end_chat', '❌ Завершить диалог'), 'DeleteMessage'))
+    return steps
+
+
+def paging(factory: UpdateFactory, admin_id: int, rng: random.Random) -> list:
+    """Администратор листает список пользователей"""
+    steps = [(factory.message(admin_id, '📋 Список пользователей'), 'SendMessage')]
+    for page, data in enumerate(['next_page', 'next_page', 'page_5', 'last_page', 'first_page'], 1):
+        # Каждое нажатие меняет страницу, поэтому сообщение редактируется
+        steps.append((
+            factory.callback(admin_id, data, f'📋 Список пользователей (Страница {page}/100)'),
+            'EditMessageText'
+        ))
+    return steps
+
+
+def broadcast(factory: UpdateFactory, admin_id: int, rng: random.Random) -> list:
+    """Администратор запускает рассылку всем пользователям"""
+    return [
+        (factory.message(admin_id, '📢 Рассылка'), 'SendMessage'),
+        (factory.message(admin_id, 'Плановое отключение горячей воды завтра с 10:00 до 14:00'), 'SendMessage')
+    ]
+
+
+SCENARIOS = {
+    'registration': registration,
+    'complaint': complaint,
+    'admin_chat': admin_chat,
+    'paging': paging,
+    'broadcast': broadcast,
+}
+
+
+def generate_sessions(sessions: int, registered_users: int, admin_id: int,
+                      mix: dict = None, broadcasts: int = 0, seed: int = None) -> list:
+    """Формирует список сессий [(сценарий, [(обновление, ожидаемый метод Bot API)])].
+
+    Обновления внутри сессии идут по порядку, как от живого пользователя;
+    сами сессии можно выполнять одновременно.
+    """
+    rng = random.Random(seed)
+    factory = UpdateFactory()
+    mix = mix or DEFAULT_MIX
+    names, weights = list(mix), list(mix.values())
+    new_user_ids = itertools.count(NEW_USER_BASE)
+    # Зарегистрированные пользователи идут по кругу, чтобы их сессии реже пересекались
+    user_ids = itertools.cycle(range(REGISTERED_USER_BASE, REGISTERED_USER_BASE + registered_users))
+
+    result = []
+    for _ in range(sessions):
+        scenario = rng.choices(names, weights)[0]
+        if scenario == 'registration':
+            user_id = next(new_user_ids)
+        elif scenario in ('paging', 'broadcast'):
+            user_id = admin_id
+        else:
+            user_id = next(user_ids)
+        result.append((scenario, SCENARIOS[scenario](factory, user_id, rng)))
+    for _ in range(broadcasts):
+        result.insert(rng.randrange(len(result) + 1), ('broadcast', broadcast(factory, admin_id, rng)))
+    return result
+
+
+def registered_users(count: int):
+    """Пользователи для предварительной загрузки в базу: кортежи для Database.import_users"""
+    for index in range(count):
+        user_id = REGISTERED_USER_BASE + index
+        yield user_id, f'user{user_id}', NAMES[index % len(NAMES)], f'+79{user_id:09d}'
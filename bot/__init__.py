@@ -1,3 +1,11 @@
-from .main import main
+def __getattr__(name):
+    # main импортируется лениво: служебным скриптам (init_db.py, users_io.py)
+    # и процессам-обработчикам не нужно загружать весь aiogram при импорте пакета
+    if name == 'main':
+        from .main import main
+        globals()['main'] = main
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__all__ = ['main'] 
\ No newline at end of file
+
+__all__ = ['main']
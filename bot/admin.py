@@ -1,9 +1,15 @@
+import html
 from aiogram import types
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from .config import ADMIN_GROUP_ID
 from .database import Database
 from .bottom import admin_panel
+from .broadcast import Broadcaster, build_payload
+from .cache import TTLCache
+
+# Количество пользователей и заявок на одной странице результатов поиска
+SEARCH_PER_PAGE = 10
 
 class AdminStates(StatesGroup):
     waiting_for_broadcast = State()
@@ -13,22 +19,28 @@ class AdminStates(StatesGroup):
     waiting_for_add_admin = State()
     waiting_for_remove_admin = State()
     waiting_for_block_reason = State()
+    waiting_for_search = State()
 
 class AdminPanel:
     def __init__(self):
         self.db = Database()
+        self.broadcaster = Broadcaster()
+        # Запросы, по которым построены сообщения с результатами поиска:
+        # {(chat_id, message_id): текст запроса}
+        self.search_queries = TTLCache(max_size=1000, ttl=60 * 60)
 
-    def is_admin(self, user_id: int) -> bool:
+    async def is_admin(self, user_id: int) -> bool:
         """Проверяет, является ли пользователь администратором"""
-        return self.db.is_admin(user_id) or self.is_main_admin(user_id)
+        # Главный администратор всегда есть в таблице admins
+        return await self.db.is_admin(user_id)
 
-    def is_main_admin(self, user_id: int) -> bool:
+    async def is_main_admin(self, user_id: int) -> bool:
         """Проверяет, является ли пользователь главным администратором"""
-        return self.db.is_main_admin(user_id)
+        return await self.db.is_main_admin(user_id)
 
     async def handle_admin_command(self, message: types.Message, state: FSMContext):
         """Обработчик команды /admin"""
-        if not self.is_admin(message.from_user.id):
+        if not await self.is_admin(message.from_user.id):
             await message.reply("❌ У вас нет прав администратора.")
             return
 
@@ -45,7 +57,7 @@ class AdminPanel:
         ]
 
         # Дополнительные кнопки для главного администратора
-        if self.is_main_admin(message.from_user.id):
+        if await self.is_main_admin(message.from_user.id):
             buttons.append([
                 types.InlineKeyboardButton(text="➕ Добавить администратора", callback_data="admin_add_admin"),
                 types.InlineKeyboardButton(text="➖ Удалить администратора", callback_data="admin_remove_admin")
@@ -56,7 +68,7 @@ class AdminPanel:
 
     async def handle_admin_callback(self, callback: types.CallbackQuery, state: FSMContext):
         """Обработчик callback-запросов админ-панели"""
-        if not self.is_admin(callback.from_user.id):
+        if not await self.is_admin(callback.from_user.id):
             await callback.answer("❌ У вас нет прав администратора.")
             return
 
@@ -76,17 +88,17 @@ class AdminPanel:
             await state.set_state(AdminStates.waiting_for_unblock_user)
             await callback.message.reply("Введите username или ID пользователя для разблокировки:")
         
-        elif callback.data == "admin_add_admin" and self.is_main_admin(callback.from_user.id):
+        elif callback.data == "admin_add_admin" and await self.is_main_admin(callback.from_user.id):
             await state.set_state(AdminStates.waiting_for_add_admin)
             await callback.message.reply("Введите username или ID пользователя для назначения администратором:")
         
-        elif callback.data == "admin_remove_admin" and self.is_main_admin(callback.from_user.id):
+        elif callback.data == "admin_remove_admin" and await self.is_main_admin(callback.from_user.id):
             await state.set_state(AdminStates.waiting_for_remove_admin)
-            admins = self.db.get_all_admins()
+            admins = await self.db.get_all_admins()
             admin_list = "\n".join([
                 f"{'👑' if admin['is_main_admin'] else '👤'} "
                 f"ID: {admin['user_id']}"
-                f"{f' (@{admin['username']})' if admin['username'] else ''}"
+                f"{' (@' + admin['username'] + ')' if admin['username'] else ''}"
                 for admin in admins
             ])
             await callback.message.reply(
@@ -99,18 +111,18 @@ class AdminPanel:
 
     async def handle_add_admin(self, message: types.Message, state: FSMContext):
         """Обработчик добавления администратора"""
-        if not self.is_main_admin(message.from_user.id):
+        if not await self.is_main_admin(message.from_user.id):
             await message.reply("❌ Только главный администратор может добавлять новых администраторов.")
             return
 
         # Ищем пользователя по username или ID
-        user = self.db.get_user_by_username_or_id(message.text)
+        user = await self.db.get_user_by_username_or_id(message.text)
         
         if user:
-            if self.db.is_admin(user['user_id']):
+            if await self.db.is_admin(user['user_id']):
                 await message.reply("❌ Этот пользователь уже является администратором.")
             else:
-                self.db.add_admin(user['user_id'], user['username'])
+                await self.db.add_admin(user['user_id'], user['username'])
                 await message.reply(
                     f"✅ Пользователь {user['full_name']} (@{user['username']}) "
                     "успешно назначен администратором."
@@ -125,7 +137,7 @@ class AdminPanel:
 
     async def handle_remove_admin(self, message: types.Message, state: FSMContext):
         """Обработчик удаления администратора"""
-        if not self.is_main_admin(message.from_user.id):
+        if not await self.is_main_admin(message.from_user.id):
             await message.reply("❌ Только главный администратор может удалять администраторов.")
             return
 
@@ -134,15 +146,15 @@ class AdminPanel:
             user_id = int(message.text)
         else:
             username = message.text.lstrip('@')
-            user = self.db.get_user_by_username(username)
+            user = await self.db.get_user_by_username(username)
             if user:
                 user_id = user['user_id']
 
         if user_id:
-            if self.db.is_main_admin(user_id):
+            if await self.db.is_main_admin(user_id):
                 await message.reply("❌ Нельзя удалить главного администратора.")
-            elif self.db.is_admin(user_id):
-                self.db.remove_admin(user_id)
+            elif await self.db.is_admin(user_id):
+                await self.db.remove_admin(user_id)
                 await message.reply("✅ Администратор успешно удален.")
             else:
                 await message.reply("❌ Этот пользователь не является администратором.")
@@ -153,72 +165,25 @@ class AdminPanel:
 
     async def handle_broadcast(self, message: types.Message, state: FSMContext):
         """Обработчик рассылки"""
-        if not self.is_admin(message.from_user.id):
+        if not await self.is_admin(message.from_user.id):
             await message.reply("❌ У вас нет прав администратора.")
             return
 
-        # Получаем всех пользователей
-        users = self.db.get_all_users()
-        
-        # Исключаем создателя рассылки из списка получателей
-        users = [user for user in users if user['user_id'] != message.from_user.id]
-        
-        if not users:
-            await message.reply("❌ Нет пользователей для рассылки.")
-            return
-
-        # Отправляем сообщение каждому пользователю
-        success_count = 0
-        fail_count = 0
-        
-        # Отправляем сообщение о начале рассылки
+        # Рассылка идет в фоне, обработчик администратора не блокируется
         status_message = await message.reply("📤 Начинаю рассылку...")
-        
-        for user in users:
-            try:
-                if message.photo:
-                    await message.bot.send_photo(
-                        chat_id=user['user_id'],
-                        photo=message.photo[-1].file_id,
-                        caption=message.caption if message.caption else None
-                    )
-                elif message.video:
-                    await message.bot.send_video(
-                        chat_id=user['user_id'],
-                        video=message.video.file_id,
-                        caption=message.caption if message.caption else None
-                    )
-                else:
-                    await message.bot.send_message(
-                        chat_id=user['user_id'],
-                        text=message.text
-                    )
-                success_count += 1
-            except Exception as e:
-                print(f"Ошибка при отправке сообщения пользователю {user['user_id']}: {e}")
-                fail_count += 1
-            
-            # Обновляем статус каждые 10 сообщений
-            if (success_count + fail_count) % 10 == 0:
-                await status_message.edit_text(
-                    f"📤 Рассылка в процессе...\n"
-                    f"✅ Успешно: {success_count}\n"
-                    f"❌ Ошибок: {fail_count}"
-                )
-        
-        # Отправляем итоговый статус
-        await status_message.edit_text(
-            f"📤 Рассылка завершена!\n"
-            f"✅ Успешно отправлено: {success_count}\n"
-            f"❌ Ошибок: {fail_count}"
+        await self.broadcaster.start(
+            message.bot,
+            status_message,
+            build_payload(message),
+            created_by=message.from_user.id  # Создатель рассылки не получает ее сам
         )
-        
+
         # Очищаем состояние
         await state.clear()
 
     async def handle_user_info(self, message: types.Message, state: FSMContext):
         """Обработчик получения информации о пользователе"""
-        if not self.is_admin(message.from_user.id):
+        if not await self.is_admin(message.from_user.id):
             return
 
         user_id = None
@@ -226,15 +191,15 @@ class AdminPanel:
             user_id = int(message.text)
         else:
             username = message.text.lstrip('@')
-            user = self.db.get_user_by_username(username)
+            user = await self.db.get_user_by_username(username)
             if user:
                 user_id = user['user_id']
 
         if user_id:
-            user_data = self.db.get_user(user_id)
+            user_data = await self.db.get_user(user_id)
             if user_data:
-                admin_status = "👑 Главный администратор" if self.db.is_main_admin(user_id) else "👤 Администратор" if self.db.is_admin(user_id) else "👤 Пользователь"
-                blocked_status = "🚫 Заблокирован" if self.db.is_user_blocked(user_id) else "✅ Активен"
+                admin_status = "👑 Главный администратор" if await self.db.is_main_admin(user_id) else "👤 Администратор" if await self.db.is_admin(user_id) else "👤 Пользователь"
+                blocked_status = "🚫 Заблокирован" if await self.db.is_user_blocked(user_id) else "✅ Активен"
                 await message.reply(
                     f"Информация о пользователе:\n"
                     f"ID: {user_data['user_id']}\n"
@@ -253,26 +218,26 @@ class AdminPanel:
 
     async def handle_block_user(self, message: types.Message, state: FSMContext):
         """Обработчик блокировки пользователя"""
-        if not self.is_admin(message.from_user.id):
+        if not await self.is_admin(message.from_user.id):
             return
 
         # Ищем пользователя по username или ID
-        user = self.db.get_user_by_username_or_id(message.text)
+        user = await self.db.get_user_by_username_or_id(message.text)
         
         if user:
             # Проверяем, не является ли пользователь администратором
-            if self.is_admin(user['user_id']):
+            if await self.is_admin(user['user_id']):
                 await message.reply("❌ Нельзя заблокировать администратора.")
                 return
             
             # Проверяем, не заблокирован ли уже пользователь
-            if self.db.is_user_blocked(user['user_id']):
+            if await self.db.is_user_blocked(user['user_id']):
                 await message.reply("❌ Этот пользователь уже заблокирован.")
                 return
             
             else:
                 # Запрашиваем причину блокировки
-                await state.update_data(block_user_id=user['user_id'], block_user_info=user)
+                await state.update_data(block_user_id=user['user_id'], block_user_info=dict(user))
                 await state.set_state(AdminStates.waiting_for_block_reason)
                 await message.reply(
                     "Введите причину блокировки пользователя или нажмите 'Пропустить':",
@@ -303,7 +268,7 @@ class AdminPanel:
         reason = None if message.text == "Пропустить" else message.text
 
         try:
-            self.db.block_user(user_id, message.from_user.id, reason)
+            await self.db.block_user(user_id, message.from_user.id, reason)
             response = f"✅ Пользователь {user_info['full_name']} (@{user_info['username']}) заблокирован."
             if reason:
                 response += f"\nПричина: {reason}"
@@ -318,20 +283,20 @@ class AdminPanel:
 
     async def handle_unblock_user(self, message: types.Message, state: FSMContext):
         """Обработчик разблокировки пользователя"""
-        if not self.is_admin(message.from_user.id):
+        if not await self.is_admin(message.from_user.id):
             await message.reply("❌ У вас нет прав администратора.")
             return
 
         # Ищем пользователя по username или ID
-        user = self.db.get_user_by_username_or_id(message.text)
+        user = await self.db.get_user_by_username_or_id(message.text)
         
         if user:
             user_id = user['user_id']
-            if not self.db.is_user_blocked(user_id):
+            if not await self.db.is_user_blocked(user_id):
                 await message.reply("❌ Этот пользователь не заблокирован.")
             else:
                 try:
-                    self.db.unblock_user(user_id)
+                    await self.db.unblock_user(user_id)
                     await message.reply(
                         f"✅ Пользователь {user['full_name']} (@{user['username']}) разблокирован."
                     )
@@ -345,6 +310,81 @@ class AdminPanel:
 
         await state.clear()
 
-    def is_user_blocked(self, user_id: int) -> bool:
+    async def is_user_blocked(self, user_id: int) -> bool:
         """Проверяет, заблокирован ли пользователь"""
-        return self.db.is_user_blocked(user_id) 
\ No newline at end of file
+        return await self.db.is_user_blocked(user_id) 
+
+    async def handle_search(self, message: types.Message, state: FSMContext):
+        """Обработчик поискового запроса администратора"""
+        if not await self.is_admin(message.from_user.id):
+            await message.reply("❌ У вас нет прав администратора.")
+            await state.clear()
+            return
+
+        text, keyboard = await self.build_search_page(message.text, 1)
+        result = await message.reply(text, reply_markup=keyboard)
+        self.search_queries.set((result.chat.id, result.message_id), message.text)
+
+    async def handle_search_page(self, callback: types.CallbackQuery, page: int):
+        """Переход между страницами результатов поиска"""
+        if not await self.is_admin(callback.from_user.id):
+            await callback.answer("❌ У вас нет прав администратора.")
+            return
+
+        query = self.search_queries.get((callback.message.chat.id, callback.message.message_id))
+        if query is None:
+            await callback.answer("Результаты поиска устарели, выполните поиск заново")
+            return
+
+        text, keyboard = await self.build_search_page(query, page)
+        await callback.message.edit_text(text, reply_markup=keyboard)
+
+    async def build_search_page(self, query: str, page: int):
+        """Формирует текст и клавиатуру страницы результатов поиска"""
+        offset = (page - 1) * SEARCH_PER_PAGE
+        # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+        users = await self.db.search_users(query, SEARCH_PER_PAGE + 1, offset)
+        tickets = await self.db.search_tickets(query, SEARCH_PER_PAGE + 1, offset)
+        has_next = len(users) > SEARCH_PER_PAGE or len(tickets) > SEARCH_PER_PAGE
+
+        if not users and not tickets:
+            if page == 1:
+                return (
+                    "🔎 Ничего не найдено.\n"
+                    "Введите не менее 3 символов имени, телефона, username или адреса.",
+                    None
+                )
+            return f"🔎 Результаты по запросу «{html.escape(query)}» закончились.", None
+
+        # Сообщения отправляются с разметкой HTML, поэтому введенный текст экранируется
+        text = f"🔎 Результаты по запросу «{html.escape(query)}» (Страница {page})\n\n"
+        if users:
+            text += "👥 Пользователи:\n"
+            for user in users[:SEARCH_PER_PAGE]:
+                text += (
+                    f"{html.escape(user['full_name'] or '')}\n"
+                    f"ID: {user['user_id']} | "
+                    f"@{html.escape(user['username']) if user['username'] else 'Нет username'} | "
+                    f"{html.escape(user['phone'] or '')}\n"
+                )
+            text += "\n"
+        if tickets:
+            text += "📛 Заявки:\n"
+            for ticket in tickets[:SEARCH_PER_PAGE]:
+                kind = "Предложение" if ticket['kind'] == 'suggestion' else "Жалоба"
+                description = ticket['description'] or ""
+                if len(description) > 100:
+                    description = description[:100] + "…"
+                text += (
+                    f"№{ticket['ticket_id']} ({kind}, {ticket['created_at']})\n"
+                    f"Адрес: {html.escape(ticket['address'] or '')}\n"
+                    f"{html.escape(description)}\n"
+                )
+
+        buttons = []
+        if page > 1:
+            buttons.append(types.InlineKeyboardButton(text="◀️", callback_data=f"search_page_{page - 1}"))
+        if has_next:
+            buttons.append(types.InlineKeyboardButton(text="▶️", callback_data=f"search_page_{page + 1}"))
+        keyboard = types.InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+        return text, keyboard
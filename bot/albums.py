@@ -0,0 +1,61 @@
+import asyncio
+from aiogram import types
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import Message
+from .cache import TTLCache
+
+# Сколько секунд ждать остальные сообщения альбома после первого
+ALBUM_LATENCY = 0.5
+
+
+class AlbumMiddleware(BaseMiddleware):
+    """Собирает сообщения одного альбома (media_group_id) и передает их обработчику одним вызовом"""
+
+    def __init__(self, latency: float = ALBUM_LATENCY):
+        self.latency = latency
+        # Собираемые альбомы: {(chat_id, media_group_id): [сообщения]}
+        self._albums = {}
+        # Уже переданные обработчику альбомы, чтобы опоздавшие сообщения
+        # не попали в следующий шаг диалога
+        self._done = TTLCache(max_size=1000, ttl=60)
+
+    async def __call__(self, handler, event, data):
+        if not isinstance(event, Message) or not event.media_group_id:
+            return await handler(event, data)
+
+        key = (event.chat.id, event.media_group_id)
+        if self._done.get(key):
+            return
+        album = self._albums.get(key)
+        if album is not None:
+            album.append(event)
+            return
+
+        self._albums[key] = album = [event]
+        await asyncio.sleep(self.latency)
+        del self._albums[key]
+        self._done.set(key, True)
+        album.sort(key=lambda message: message.message_id)
+        data['album'] = album
+        return await handler(album[0], data)
+
+
+def get_media(message: Message) -> list:
+    """Возвращает медиафайлы сообщения в виде [тип, file_id]"""
+    if message.photo:
+        return [['photo', message.photo[-1].file_id]]
+    if message.video:
+        return [['video', message.video.file_id]]
+    return []
+
+
+def build_media_group(media: list, caption: str = None, parse_mode: str = None) -> list:
+    """Формирует альбом для send_media_group; подпись ставится к первому файлу"""
+    group = []
+    for index, (media_type, file_id) in enumerate(media):
+        kwargs = {'caption': caption, 'parse_mode': parse_mode} if index == 0 and caption else {}
+        if media_type == 'photo':
+            group.append(types.InputMediaPhoto(media=file_id, **kwargs))
+        else:
+            group.append(types.InputMediaVideo(media=file_id, **kwargs))
+    return group
@@ -0,0 +1,44 @@
+from aiogram import Bot, Dispatcher
+from aiogram.enums import ParseMode
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
+from .config import BOT_TOKEN
+from .storage import SQLiteStorage
+from .handlers import register_handlers
+from .outbound import OutboundQueue
+from .metrics import Metrics
+from .profiling import UpdateProfiler
+from .monitoring import (
+    UpdateMetricsMiddleware, UpdateLoggingMiddleware, HandlerNameMiddleware, TelegramMetricsMiddleware
+)
+
+
+def create_bot(session: BaseSession = None) -> Bot:
+    """Создает бота с настройками по умолчанию"""
+    # Сессию подменяет нагрузочный тест, чтобы запросы не уходили в сеть
+    bot = Bot(token=BOT_TOKEN, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    # Все сообщения бота, включая ответы обработчиков, идут через общую очередь
+    bot.session.middleware(OutboundQueue())
+    # Внутри очереди, чтобы в метрики попадало время самого запроса без ожидания
+    bot.session.middleware(TelegramMetricsMiddleware())
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    """Создает диспетчер с зарегистрированными обработчиками"""
+    # Состояния FSM хранятся в базе бота и переживают перезапуск
+    storage = SQLiteStorage()
+    dp = Dispatcher(storage=storage)
+    # Метрики и журнал обработчиков: внешние middleware замеряют обновление
+    # целиком, внутренние сообщают им имя выбранного обработчика
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.update.outer_middleware(UpdateLoggingMiddleware())
+    dp.message.middleware(HandlerNameMiddleware())
+    dp.callback_query.middleware(HandlerNameMiddleware())
+    # Профилирование медленных обновлений включается PROFILING или командой /profile
+    profiler = UpdateProfiler()
+    dp.message.middleware(profiler)
+    dp.callback_query.middleware(profiler)
+    Metrics().add_collector(storage.collect_metrics)
+    register_handlers(dp)
+    return dp
@@ -16,7 +16,7 @@ admin_panel = types.ReplyKeyboardMarkup(
         [types.KeyboardButton(text="📢 Рассылка"), types.KeyboardButton(text="👤 Информация о пользователе")],
         [types.KeyboardButton(text="🚫 Блокировка"), types.KeyboardButton(text="✅ Разблокировка")],
         [types.KeyboardButton(text="👥 Управление админами")],
-        [types.KeyboardButton(text="📋 Список пользователей")],
+        [types.KeyboardButton(text="📋 Список пользователей"), types.KeyboardButton(text="🔎 Поиск")],
         [types.KeyboardButton(text="🔄 Вернуться в пользовательский режим")]
     ],
     resize_keyboard=True
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramForbiddenError
+from .database import Database
+from .metrics import Metrics
+from .outbound import current_lane, BROADCAST_LANE
+
+logger = logging.getLogger(__name__)
+
+# Количество одновременных отправок в одной рассылке
+BROADCAST_CONCURRENCY = 20
+# Как часто (в секундах) обновлять сообщение о ходе рассылки
+PROGRESS_INTERVAL = 5
+# Как часто (в секундах) сохранять результаты доставки в базу
+FLUSH_INTERVAL = 1
+# Сколько результатов доставки копить перед досрочным сохранением
+FLUSH_SIZE = 100
+
+
+def build_payload(message: types.Message) -> dict:
+    """Формирует содержимое рассылки из сообщения администратора"""
+    if message.photo:
+        return {'type': 'photo', 'file_id': message.photo[-1].file_id, 'caption': message.caption}
+    if message.video:
+        return {'type': 'video', 'file_id': message.video.file_id, 'caption': message.caption}
+    return {'type': 'text', 'text': message.text}
+
+
+class Broadcaster:
+    """Фоновые рассылки с ограничением частоты отправки и сохранением прогресса"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Broadcaster, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            self.db = Database()
+            self.metrics = Metrics()
+            # Ссылки на запущенные задачи, чтобы их не собрал сборщик мусора
+            self._tasks = set()
+            self._initialized = True
+
+    async def start(self, bot: Bot, status_message: types.Message, payload: dict, created_by: int):
+        """Сохраняет рассылку в базе и запускает ее в фоне"""
+        job_id = await self.db.create_broadcast(
+            created_by, payload, status_message.chat.id, status_message.message_id
+        )
+        return self._spawn(bot, {
+            'job_id': job_id,
+            'created_by': created_by,
+            'payload': payload,
+            'status_chat_id': status_message.chat.id,
+            'status_message_id': status_message.message_id
+        })
+
+    async def resume_unfinished(self, bot: Bot):
+        """Продолжает рассылки, прерванные перезапуском бота"""
+        for job in await self.db.get_unfinished_broadcasts():
+            logger.info("Возобновление рассылки %s", job['job_id'])
+            self._spawn(bot, job)
+
+    async def wait(self):
+        """Дожидается завершения запущенных рассылок"""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def stop(self):
+        """Останавливает рассылки, сохраняя прогресс для возобновления"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _spawn(self, bot: Bot, job: dict):
+        task = asyncio.create_task(self._run(bot, job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, bot: Bot, job: dict):
+        # Сообщения рассылки уступают очередь ответам пользователям и уведомлениям
+        current_lane.set(BROADCAST_LANE)
+        job_id = job['job_id']
+        # Статистика с учетом доставок, сделанных до перезапуска
+        stats = await self.db.get_broadcast_stats(job_id)
+        pending = []
+        queue = asyncio.Queue(maxsize=BROADCAST_CONCURRENCY * 2)
+
+        async def flush():
+            deliveries = pending[:]
+            pending.clear()
+            await self.db.save_broadcast_deliveries(job_id, deliveries)
+
+        async def produce():
+            # Получателей читаем из базы порциями, пропуская уже обработанных
+            try:
+                async for user_id in self.db.iter_broadcast_recipients(job_id, job['created_by']):
+                    await queue.put(user_id)
+            finally:
+                for _ in range(BROADCAST_CONCURRENCY):
+                    await queue.put(None)
+
+        async def work():
+            while True:
+                user_id = await queue.get()
+                if user_id is None:
+                    return
+                status = await self._send(bot, user_id, job['payload'])
+                stats[status] += 1
+                self.metrics.inc('bot_broadcast_messages_total', status=status)
+                pending.append((user_id, status))
+                if len(pending) >= FLUSH_SIZE:
+                    await flush()
+
+        async def report():
+            last_report = time.monotonic()
+            while True:
+                await asyncio.sleep(FLUSH_INTERVAL)
+                await flush()
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    await self._edit_status(bot, job, stats, finished=False)
+
+        reporter = asyncio.create_task(report())
+        try:
+            await asyncio.gather(produce(), *(work() for _ in range(BROADCAST_CONCURRENCY)))
+        finally:
+            reporter.cancel()
+            await flush()
+
+        await self.db.finish_broadcast(job_id)
+        if not any(stats.values()):
+            await self._edit_text(bot, job, "❌ Нет пользователей для рассылки.")
+        else:
+            await self._edit_status(bot, job, stats, finished=True)
+
+    async def _send(self, bot: Bot, chat_id: int, payload: dict) -> str:
+        """Отправляет сообщение одному получателю и возвращает результат"""
+        # Ограничение частоты и повторы после RetryAfter выполняет OutboundQueue
+        try:
+            if payload['type'] == 'photo':
+                await bot.send_photo(chat_id=chat_id, photo=payload['file_id'], caption=payload['caption'])
+            elif payload['type'] == 'video':
+                await bot.send_video(chat_id=chat_id, video=payload['file_id'], caption=payload['caption'])
+            else:
+                await bot.send_message(chat_id=chat_id, text=payload['text'])
+            return 'sent'
+        except TelegramForbiddenError:
+            return 'blocked'
+        except Exception as e:
+            logger.error("Ошибка при отправке сообщения пользователю %s: %s", chat_id, e)
+            return 'failed'
+
+    async def _edit_status(self, bot: Bot, job: dict, stats: dict, finished: bool):
+        title = "📤 Рассылка завершена!" if finished else "📤 Рассылка в процессе..."
+        await self._edit_text(
+            bot, job,
+            f"{title}\n"
+            f"✅ Успешно отправлено: {stats['sent']}\n"
+            f"🚫 Бот заблокирован: {stats['blocked']}\n"
+            f"❌ Ошибок: {stats['failed']}"
+        )
+
+    async def _edit_text(self, bot: Bot, job: dict, text: str):
+        try:
+            await bot.edit_message_text(
+                text=text,
+                chat_id=job['status_chat_id'],
+                message_id=job['status_message_id']
+            )
+        except Exception as e:
+            logger.error("Ошибка при обновлении статуса рассылки: %s", e)
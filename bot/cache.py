@@ -0,0 +1,36 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Ограниченный по размеру LRU-кэш, записи которого устаревают через ttl секунд"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 24 * 60 * 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        # {key: (момент устаревания, value)} в порядке последнего обращения
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+import time
+from aiohttp import web
+from .config import (
+    RUN_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+    METRICS_HOST, METRICS_PORT
+)
+from .database import Database
+from .broadcast import Broadcaster
+from .digest import ComplaintDigest
+from .outbound import OutboundQueue
+from .app import create_bot, create_dispatcher
+from .webhook import handle_health, SHUTDOWN_TIMEOUT
+from .monitoring import start_metrics_server
+from .logs import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Время ожидания новых обновлений при long polling, в секундах
+POLLING_TIMEOUT = 30
+# Поля обновления, по которым определяется пользователь, в порядке приоритета
+USER_FIELDS = ('from', 'user', 'chat')
+# Как часто (в секундах) проверять, что процессы-обработчики живы
+WORKER_CHECK_INTERVAL = 1
+# Процесс, который завершается раньше этого времени (в секундах) после запуска
+# MAX_WORKER_RESTARTS раз подряд, не перезапускается, а останавливает бота
+WORKER_MIN_UPTIME = 60
+MAX_WORKER_RESTARTS = 5
+
+
+def extract_user_id(update: dict) -> int:
+    """Возвращает ID пользователя, от которого пришло обновление, или 0"""
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        for field in USER_FIELDS:
+            user = value.get(field)
+            if isinstance(user, dict) and 'id' in user:
+                return user['id']
+    return 0
+
+
+def _worker_main(worker_index: int, worker_count: int, queue: multiprocessing.Queue):
+    # Процесс-обработчик останавливается по команде главного процесса, а не по Ctrl+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    setup_logging()
+    asyncio.run(_run_worker(worker_index, worker_count, queue))
+
+
+async def _run_worker(worker_index: int, worker_count: int, queue: multiprocessing.Queue):
+    db = Database()
+    db.configure_worker(worker_index, worker_count)
+    await db.connect()
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    workflow_data = {'dispatcher': dp, 'bots': [bot], **dp.workflow_data}
+    await dp.emit_startup(bot=bot, **workflow_data)
+
+    # Изменения блокировок, администраторов и пересылок из других процессов
+    watcher = asyncio.create_task(db.watch_changes())
+    broadcaster = Broadcaster()
+    # Прерванные рассылки продолжает только первый процесс
+    if worker_index == 0:
+        await broadcaster.resume_unfinished(bot)
+    metrics_server = None
+    if METRICS_PORT:
+        metrics_server = await start_metrics_server(METRICS_HOST, METRICS_PORT + worker_index)
+
+    tasks = set()
+
+    async def process(update: dict):
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception:
+            # Ошибка уже записана в журнал aiogram
+            pass
+
+    loop = asyncio.get_running_loop()
+    logger.info("Процесс-обработчик %s запущен", worker_index)
+    try:
+        while True:
+            update = await loop.run_in_executor(None, queue.get)
+            if update is None:
+                break
+            task = asyncio.create_task(process(update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks, timeout=SHUTDOWN_TIMEOUT)
+    finally:
+        watcher.cancel()
+        await broadcaster.stop()
+        await OutboundQueue().wait_background()
+        await ComplaintDigest().stop(bot)
+        await dp.emit_shutdown(bot=bot, **workflow_data)
+        await bot.session.close()
+        if metrics_server:
+            await metrics_server.cleanup()
+        await db.close()
+        logger.info("Процесс-обработчик %s остановлен", worker_index)
+
+
+async def _poll_updates(bot, allowed_updates: list, route):
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(
+                offset=offset,
+                timeout=POLLING_TIMEOUT,
+                allowed_updates=allowed_updates
+            )
+        except Exception as e:
+            logger.error("Ошибка при получении обновлений: %s", e)
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            route(update.model_dump(mode='json', by_alias=True, exclude_none=True))
+            offset = update.update_id + 1
+
+
+async def _serve_webhook(bot, allowed_updates: list, route, stop_event: asyncio.Event):
+    async def handle_update(request: web.Request) -> web.Response:
+        if WEBHOOK_SECRET and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != WEBHOOK_SECRET:
+            return web.Response(status=401, text='Unauthorized')
+        route(await request.json())
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_get('/health', handle_health)
+    app.router.add_post(WEBHOOK_PATH, handle_update)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+    logger.info("Webhook-сервер запущен на %s:%s%s", WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH)
+
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=allowed_updates
+        )
+
+    try:
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
+
+
+async def run_cluster(worker_count: int):
+    """Принимает обновления и распределяет их между процессами по ID пользователя"""
+    # Обновления одного пользователя всегда попадают в один процесс,
+    # поэтому его состояние FSM и порядок сообщений не нарушаются
+    context = multiprocessing.get_context('spawn')
+    queues = [context.Queue() for _ in range(worker_count)]
+    workers = [None] * worker_count
+    started_at = [0.0] * worker_count
+
+    def start_worker(index: int):
+        if workers[index] is not None:
+            # Упавший процесс мог оставить занятой блокировку чтения своей очереди,
+            # и новый процесс не получил бы из нее ни одного обновления. Поэтому
+            # перезапущенный процесс получает новую очередь, а обновления,
+            # оставшиеся в старой, теряются
+            old_queue = queues[index]
+            queues[index] = context.Queue()
+            old_queue.close()
+            # Иначе выход главного процесса ждал бы записи в очередь, которую никто не читает
+            old_queue.cancel_join_thread()
+        worker = context.Process(target=_worker_main, args=(index, worker_count, queues[index]), daemon=True)
+        worker.start()
+        workers[index] = worker
+        started_at[index] = time.monotonic()
+
+    async def watch_workers():
+        """Перезапускает завершившиеся процессы-обработчики"""
+        # Иначе обновления пользователей упавшего процесса копились бы в его очереди без ответа
+        failures = [0] * worker_count
+        while True:
+            await asyncio.sleep(WORKER_CHECK_INTERVAL)
+            for index, worker in enumerate(workers):
+                if worker.is_alive():
+                    continue
+                if time.monotonic() - started_at[index] < WORKER_MIN_UPTIME:
+                    failures[index] += 1
+                else:
+                    failures[index] = 1
+                if failures[index] > MAX_WORKER_RESTARTS:
+                    logger.critical(
+                        "Процесс-обработчик %s завершается сразу после запуска (код %s), бот останавливается",
+                        index, worker.exitcode
+                    )
+                    raise RuntimeError(f"Не удается запустить процесс-обработчик {index}")
+                logger.error("Процесс-обработчик %s завершился с кодом %s, перезапуск", index, worker.exitcode)
+                start_worker(index)
+
+    for index in range(worker_count):
+        start_worker(index)
+
+    def route(update: dict):
+        queues[extract_user_id(update) % worker_count].put(update)
+
+    bot = create_bot()
+    # Диспетчер нужен только для списка используемых типов обновлений
+    allowed_updates = create_dispatcher().resolve_used_update_types()
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows: остановка по Ctrl+C придет как KeyboardInterrupt
+            pass
+
+    watcher = asyncio.create_task(watch_workers())
+    watcher.add_done_callback(lambda _: stop_event.set())
+
+    logger.info("Запущено процессов-обработчиков: %s", worker_count)
+    try:
+        if RUN_MODE == 'webhook':
+            await _serve_webhook(bot, allowed_updates, route, stop_event)
+        else:
+            polling = asyncio.create_task(_poll_updates(bot, allowed_updates, route))
+            await stop_event.wait()
+            polling.cancel()
+            await asyncio.gather(polling, return_exceptions=True)
+    finally:
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+        logger.info("Остановка процессов-обработчиков...")
+        for queue in queues:
+            queue.put(None)
+        for worker in workers:
+            await loop.run_in_executor(None, worker.join, SHUTDOWN_TIMEOUT * 2)
+            if worker.is_alive():
+                worker.terminate()
+        await bot.session.close()
+    # Остановка из-за неисправного процесса-обработчика завершает бота с ошибкой
+    if not watcher.cancelled() and watcher.exception():
+        raise watcher.exception()
@@ -5,4 +5,37 @@ load_dotenv()
 
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 ADMIN_GROUP_ID = os.getenv('ADMIN_GROUP_ID')  # ID группы для администраторов
-MAIN_ADMIN_ID = os.getenv('MAIN_ADMIN_ID')  # ID главного администратора 
\ No newline at end of file
+MAIN_ADMIN_ID = os.getenv('MAIN_ADMIN_ID')  # ID главного администратора 
+
+# Режим получения обновлений: polling или webhook
+RUN_MODE = os.getenv('RUN_MODE', 'polling')
+# Настройки webhook-сервера
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Публичный адрес бота, например https://bot.example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')  # Секретный токен для проверки запросов от Telegram
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+
+# Количество процессов-обработчиков; обновления распределяются между ними по ID пользователя
+WORKERS = int(os.getenv('WORKERS', '1'))
+
+# Окно сводки жалоб для группы администраторов в секундах; 0 - каждая жалоба отдельным сообщением
+DIGEST_WINDOW = float(os.getenv('DIGEST_WINDOW', '0'))
+
+# Адрес HTTP-сервера метрик Prometheus (/metrics); порт 0 - сервер не запускается.
+# В режиме нескольких процессов обработчик с номером N слушает порт METRICS_PORT + N
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Уровень журнала бота
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+# Доля записываемых частых событий: "событие=доля,...". Ошибки записываются всегда
+LOG_SAMPLING = os.getenv('LOG_SAMPLING', 'update_handled=0.1,user_saved=0.1')
+
+# Профилирование медленных обновлений: 1 - включено с запуска, иначе включается командой /profile.
+# Обновления дольше PROFILE_THRESHOLD секунд сохраняются в PROFILE_DIR (по умолчанию profiles/ рядом с базой)
+PROFILING = os.getenv('PROFILING', '0') == '1'
+PROFILE_THRESHOLD = float(os.getenv('PROFILE_THRESHOLD', '1'))
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+# Сколько последних профилей хранить
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
@@ -1,7 +1,53 @@
-import sqlite3
+import asyncio
+import json
+import logging
 import os
+import sqlite3
+from contextlib import asynccontextmanager
+import aiosqlite
 from .config import MAIN_ADMIN_ID
+from .cache import TTLCache
+from .migrations import migrate
+from .timing import StageTimer
+from .metrics import track_queries
+
+logger = logging.getLogger(__name__)
+
+# Настройки SQLite: журнал WAL позволяет читать во время записи, а synchronous=NORMAL
+# синхронизирует журнал с диском только при контрольных точках, а не на каждой транзакции
+PRAGMAS = {
+    # Ожидание блокировки другим процессом, в миллисекундах. Задается первым:
+    # переключение в WAL при одновременном запуске процессов тоже ждет блокировку
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,  # 20 МБ страничного кэша
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+# Как часто (в секундах) фиксировать накопленные записи
+COMMIT_INTERVAL = 0.2
+# Сколько записей копить перед досрочной фиксацией
+COMMIT_BATCH_SIZE = 100
+# Количество соединений только для чтения
+READ_POOL_SIZE = 4
+# Сколько строк загружать одной транзакцией при импорте пользователей
+IMPORT_CHUNK_SIZE = 5000
+# Минимальная длина слова для полнотекстового поиска (токенизатор trigram)
+SEARCH_MIN_LENGTH = 3
+# Первый ID тестовых пользователей из create_test_users
+TEST_USER_ID_BASE = 1000000
+
+
+def make_search_query(text: str) -> str:
+    """Превращает текст администратора в запрос FTS5: все слова должны встретиться"""
+    words = [word for word in text.split() if len(word) >= SEARCH_MIN_LENGTH]
+    # Каждое слово берется в кавычки, чтобы символы вроде + и - не считались операторами
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in words)
 
+
+# Количество вызовов и время выполнения каждого метода попадают в метрики
+@track_queries
 class Database:
     _instance = None
     _initialized = False
@@ -16,365 +62,847 @@ class Database:
             # Получаем путь к корневой директории бота (на уровень выше bot/)
             root_dir = os.path.dirname(os.path.dirname(__file__))
             self.db_path = os.path.join(root_dir, 'bot_database.db')
-            print(f"Подключение к базе данных: {self.db_path}")
-            
-            # Создаем директорию для базы данных, если её нет
-            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-            
-            # Используем check_same_thread=False для работы в многопоточной среде
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.create_tables()
-            self.init_main_admin()
-            print("База данных успешно инициализирована")
+            # Единственное соединение для записи и пул соединений для чтения
+            self.conn = None
+            self._readers = None
+            # Блокировка для записей: операции из разных корутин не должны
+            # перемешиваться внутри одной транзакции
+            self._write_lock = asyncio.Lock()
+            # Записи, выполненные в открытой транзакции, и задача ее отложенной фиксации
+            self._pending_writes = 0
+            self._commit_task = None
+            # Кэш таблиц blocked_users и admins для проверок на каждом обновлении:
+            # {user_id: reason} и {user_id: is_main_admin}
+            self._blocked_users = {}
+            self._admins = {}
+            # Счетчик пользователей для заголовка списка пользователей
+            self._user_count = 0
+            # Фоновые записи, которые нужно дождаться перед закрытием соединения
+            self._background_writes = set()
+            # Кэши связи сообщений в группе администраторов с пользователями:
+            # {admin_msg_id: данные пользователя} и {user_id: ID последнего сообщения}
+            self._relay_by_admin_msg = TTLCache()
+            self._relay_last_by_user = TTLCache()
+            # Номер процесса и число процессов при запуске в несколько процессов
+            self._worker_index = 0
+            self._worker_count = 1
+            self._last_change_id = 0
             self._initialized = True
 
-    def create_tables(self):
-        cursor = self.conn.cursor()
-        print("Создание таблиц в базе данных...")
-        
-        # Таблица пользователей
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            full_name TEXT,
-            phone TEXT,
-            current_state TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Проверяем наличие столбца current_state и добавляем его, если отсутствует
-        cursor.execute("PRAGMA table_info(users)")
-        columns = [column[1] for column in cursor.fetchall()]
-        if 'current_state' not in columns:
-            print("Добавление столбца current_state в таблицу users...")
-            cursor.execute('ALTER TABLE users ADD COLUMN current_state TEXT')
-            print("Столбец current_state успешно добавлен")
-        
-        # Таблица администраторов
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS admins (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            is_main_admin BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Таблица заблокированных пользователей
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS blocked_users (
-            user_id INTEGER PRIMARY KEY,
-            blocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            blocked_by INTEGER,
-            reason TEXT,
-            FOREIGN KEY(blocked_by) REFERENCES users(user_id)
-        )
-        ''')
-        
-        self.conn.commit()
-        print("Таблицы успешно созданы")
-
-    def init_main_admin(self):
+    def configure_worker(self, worker_index: int, worker_count: int):
+        """Настраивает базу для работы в одном из нескольких процессов бота"""
+        self._worker_index = worker_index
+        self._worker_count = worker_count
+
+    async def connect(self):
+        """Открывает соединение с базой данных и создает таблицы"""
+        if self.conn is not None:
+            return
+        logger.info("Подключение к базе данных: %s", self.db_path)
+        timer = StageTimer()
+
+        # Создаем директорию для базы данных, если её нет
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        # aiosqlite выполняет все запросы в отдельном потоке соединения,
+        # поэтому обращения к базе не блокируют цикл событий
+        self.conn = await aiosqlite.connect(self.db_path)
+        for name, value in PRAGMAS.items():
+            await self.conn.execute(f'PRAGMA {name} = {value}')
+        timer.mark('подключение')
+        # Если версия схемы совпадает с последней миграцией, DDL не выполняется
+        await self.migrate()
+        timer.mark('миграции')
+        await self.load_cache()
+        timer.mark('кэш')
+        await self.init_main_admin()
+        timer.mark('главный администратор')
+        # Читатели открываются после перевода базы в режим WAL: в нем чтение
+        # не ждет записи и видит последнее зафиксированное состояние
+        self._readers = asyncio.Queue()
+        for reader in await asyncio.gather(*(self._open_reader() for _ in range(READ_POOL_SIZE))):
+            self._readers.put_nowait(reader)
+        timer.mark('читатели')
+        logger.info("База данных успешно инициализирована за %s", timer)
+
+    async def _open_reader(self) -> aiosqlite.Connection:
+        reader = await aiosqlite.connect(self.db_path)
+        # Строки sqlite3.Row доступны по имени столбца, как словари,
+        # но хранят значения в одном компактном кортеже
+        reader.row_factory = sqlite3.Row
+        for name in ('cache_size', 'mmap_size', 'temp_store', 'busy_timeout'):
+            await reader.execute(f'PRAGMA {name} = {PRAGMAS[name]}')
+        await reader.execute('PRAGMA query_only = ON')
+        return reader
+
+    async def close(self):
+        """Закрывает соединение с базой данных"""
+        if self.conn is not None:
+            await asyncio.gather(*self._background_writes, return_exceptions=True)
+            if self._commit_task is not None:
+                self._commit_task.cancel()
+                await asyncio.gather(self._commit_task, return_exceptions=True)
+            async with self._write_lock:
+                await self._commit()
+            for _ in range(READ_POOL_SIZE):
+                await (await self._readers.get()).close()
+            self._readers = None
+            await self.conn.close()
+            self.conn = None
+
+    def _write_in_background(self, coro):
+        """Выполняет запись в фоне, не задерживая обработчик"""
+        task = asyncio.create_task(self._run_in_background(coro))
+        self._background_writes.add(task)
+        task.add_done_callback(self._background_writes.discard)
+        return task
+
+    async def _run_in_background(self, coro):
+        # Ошибку фоновой записи некому обработать, поэтому она записывается в журнал
+        try:
+            await coro
+        except Exception as e:
+            logger.error("Ошибка фоновой записи в базу данных (%s): %s", coro.__qualname__, e)
+
+    @asynccontextmanager
+    async def _write(self, durable: bool = False):
+        """Выполняет запись в общей транзакции, которая фиксируется пачкой.
+
+        Записи с durable=True (блокировки и администраторы) фиксируются сразу
+        с синхронизацией на диск. При работе в несколько процессов пачки не
+        копятся, и каждая запись фиксируется сразу.
+        """
+        async with self._write_lock:
+            if durable:
+                # Уровень синхронизации нельзя менять внутри транзакции
+                await self._commit()
+                await self.conn.execute('PRAGMA synchronous = FULL')
+            try:
+                if not self.conn.in_transaction:
+                    # Блокировка записи берется сразу: при отложенном BEGIN чтение перед
+                    # записью (как в add_user) получает SQLITE_BUSY без ожидания
+                    # busy_timeout, если другой процесс успел зафиксировать изменения
+                    await self.conn.execute('BEGIN IMMEDIATE')
+                cursor = await self.conn.cursor()
+                # Точка сохранения позволяет откатить только эту запись,
+                # не теряя остальные записи пачки
+                await cursor.execute('SAVEPOINT write')
+                try:
+                    yield cursor
+                except BaseException:
+                    await cursor.execute('ROLLBACK TO write')
+                    await cursor.execute('RELEASE write')
+                    raise
+                await cursor.execute('RELEASE write')
+                self._pending_writes += 1
+                # Открытая транзакция держит блокировку записи всей базы, поэтому
+                # при нескольких процессах каждая запись фиксируется сразу: иначе
+                # процессы ждали бы друг друга до конца пачки и упирались в busy_timeout
+                if durable or self._worker_count > 1 or self._pending_writes >= COMMIT_BATCH_SIZE:
+                    await self._commit()
+                elif self._commit_task is None:
+                    self._commit_task = asyncio.create_task(self._commit_later())
+            except BaseException:
+                # Транзакция не должна остаться открытой без запланированной фиксации
+                await self._finish_transaction()
+                raise
+            finally:
+                if durable:
+                    await self._commit()
+                    await self.conn.execute(f"PRAGMA synchronous = {PRAGMAS['synchronous']}")
+
+    @asynccontextmanager
+    async def _read(self, fresh: bool = False):
+        """Выполняет чтение на свободном соединении из пула читателей.
+
+        Читатели видят только зафиксированные данные и могут отставать от
+        записей на время до COMMIT_INTERVAL. Чтение с fresh=True, которому нужны
+        собственные незафиксированные записи, идет на соединении записи.
+        """
+        if fresh and self._pending_writes:
+            async with self._write_lock:
+                if self._pending_writes:
+                    cursor = await self.conn.cursor()
+                    cursor.row_factory = sqlite3.Row
+                    yield cursor
+                    return
+        reader = await self._readers.get()
+        try:
+            yield await reader.cursor()
+        finally:
+            self._readers.put_nowait(reader)
+
+    async def commit(self):
+        """Фиксирует накопленные записи, не дожидаясь таймера"""
+        async with self._write_lock:
+            await self._commit()
+
+    async def _commit(self):
+        if self.conn.in_transaction:
+            await self.conn.commit()
+        self._pending_writes = 0
+
+    async def _finish_transaction(self):
+        """Фиксирует успешные записи пачки, а если это невозможно, откатывает транзакцию"""
+        try:
+            await self._commit()
+        except Exception as e:
+            logger.error("Ошибка при фиксации изменений в базе данных: %s", e)
+            if self.conn.in_transaction:
+                await self.conn.rollback()
+            self._pending_writes = 0
+
+    async def _commit_later(self):
+        try:
+            await asyncio.sleep(COMMIT_INTERVAL)
+            async with self._write_lock:
+                await self._finish_transaction()
+        finally:
+            self._commit_task = None
+
+    async def migrate(self) -> int:
+        """Приводит схему базы к последней версии"""
+        return await migrate(self.conn)
+
+    async def init_main_admin(self):
         """Инициализация главного администратора"""
         if MAIN_ADMIN_ID:
-            cursor = self.conn.cursor()
+            # Кэш уже загружен: если запись есть, повторная вставка ничего не изменит
+            if int(MAIN_ADMIN_ID) in self._admins:
+                return
+            cursor = await self.conn.cursor()
             try:
-                cursor.execute(
+                await cursor.execute(
                     'INSERT OR IGNORE INTO admins (user_id, is_main_admin) VALUES (?, 1)',
                     (int(MAIN_ADMIN_ID),)
                 )
-                self.conn.commit()
-                print(f"Главный администратор (ID: {MAIN_ADMIN_ID}) успешно инициализирован")
+                await self.conn.commit()
+                self._admins[int(MAIN_ADMIN_ID)] = True
+                logger.info("Главный администратор (ID: %s) успешно инициализирован", MAIN_ADMIN_ID)
             except Exception as e:
-                print(f"Ошибка при инициализации главного администратора: {e}")
-                self.conn.rollback()
+                logger.error("Ошибка при инициализации главного администратора: %s", e)
+                await self.conn.rollback()
         else:
-            print("ВНИМАНИЕ: MAIN_ADMIN_ID не установлен в конфигурации!")
+            logger.warning("MAIN_ADMIN_ID не установлен в конфигурации!")
+
+    async def load_cache(self):
+        """Загружает заблокированных пользователей и администраторов в память"""
+        await self._load_access_cache()
+        cursor = await self.conn.cursor()
+        await cursor.execute('SELECT COUNT(*) FROM users')
+        self._user_count = (await cursor.fetchone())[0]
+        await cursor.execute('SELECT MAX(change_id) FROM change_log')
+        self._last_change_id = (await cursor.fetchone())[0] or 0
+
+    async def _load_access_cache(self):
+        cursor = await self.conn.cursor()
+        await cursor.execute('SELECT user_id, reason FROM blocked_users')
+        self._blocked_users = {row[0]: row[1] for row in await cursor.fetchall()}
+        await cursor.execute('SELECT user_id, is_main_admin FROM admins')
+        self._admins = {row[0]: row[1] == 1 for row in await cursor.fetchall()}
+
+    async def _log_change(self, cursor, kind: str, key: int):
+        # Журнал нужен только другим процессам, в одном процессе кэш обновляется сразу
+        if self._worker_count > 1:
+            await cursor.execute(
+                'INSERT INTO change_log (source, kind, key) VALUES (?, ?, ?)',
+                (self._worker_index, kind, key)
+            )
 
-    def is_admin(self, user_id: int) -> bool:
+    async def apply_changes(self):
+        """Обновляет кэши по изменениям, сделанным другими процессами"""
+        async with self._read() as cursor:
+            await cursor.execute(
+                'SELECT change_id, source, kind, key FROM change_log WHERE change_id > ? ORDER BY change_id',
+                (self._last_change_id,)
+            )
+            changes = await cursor.fetchall()
+        if not changes:
+            return
+        self._last_change_id = changes[-1][0]
+        reload_access = False
+        for _, source, kind, key in changes:
+            if source == self._worker_index:
+                continue
+            if kind in ('blocked_users', 'admins'):
+                reload_access = True
+            elif kind == 'users':
+                self._user_count += 1
+            elif kind == 'relay':
+                self._relay_last_by_user.pop(key)
+        if reload_access:
+            await self._load_access_cache()
+
+    async def watch_changes(self, interval: float = 1.0, keep: int = 10000):
+        """Периодически применяет изменения других процессов"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.apply_changes()
+                # Старые записи журнала чистит только первый процесс
+                if self._worker_index == 0:
+                    async with self._write() as cursor:
+                        await cursor.execute(
+                            'DELETE FROM change_log WHERE change_id <= ?',
+                            (self._last_change_id - keep,)
+                        )
+            except Exception as e:
+                logger.error("Ошибка при получении изменений от других процессов: %s", e)
+
+    async def is_admin(self, user_id: int) -> bool:
         """Проверяет, является ли пользователь администратором"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT 1 FROM admins WHERE user_id = ?', (user_id,))
-        return cursor.fetchone() is not None
+        return user_id in self._admins
 
-    def is_main_admin(self, user_id: int) -> bool:
+    async def is_main_admin(self, user_id: int) -> bool:
         """Проверяет, является ли пользователь главным администратором"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT is_main_admin FROM admins WHERE user_id = ?', (user_id,))
-        result = cursor.fetchone()
-        return result is not None and result[0] == 1
+        return self._admins.get(user_id, False)
 
-    def add_admin(self, user_id: int, username: str = None):
+    async def add_admin(self, user_id: int, username: str = None):
         """Добавляет нового администратора"""
-        cursor = self.conn.cursor()
-        cursor.execute(
-            'INSERT OR REPLACE INTO admins (user_id, username) VALUES (?, ?)',
-            (user_id, username)
-        )
-        self.conn.commit()
-
-    def remove_admin(self, user_id: int):
+        async with self._write(durable=True) as cursor:
+            await cursor.execute(
+                'INSERT OR REPLACE INTO admins (user_id, username) VALUES (?, ?)',
+                (user_id, username)
+            )
+            await self._log_change(cursor, 'admins', user_id)
+        self._admins[user_id] = False
+
+    async def remove_admin(self, user_id: int):
         """Удаляет администратора"""
-        if not self.is_main_admin(user_id):  # Нельзя удалить главного админа
-            cursor = self.conn.cursor()
-            cursor.execute('DELETE FROM admins WHERE user_id = ? AND is_main_admin = 0', (user_id,))
-            self.conn.commit()
+        if not await self.is_main_admin(user_id):  # Нельзя удалить главного админа
+            async with self._write(durable=True) as cursor:
+                await cursor.execute('DELETE FROM admins WHERE user_id = ? AND is_main_admin = 0', (user_id,))
+                await self._log_change(cursor, 'admins', user_id)
+            self._admins.pop(user_id, None)
 
-    def get_all_admins(self) -> list:
+    async def get_all_admins(self) -> list:
         """Получает список всех администраторов"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT user_id, username, is_main_admin FROM admins')
-        return [
-            {
-                'user_id': row[0],
-                'username': row[1],
-                'is_main_admin': bool(row[2])
-            }
-            for row in cursor.fetchall()
-        ]
+        async with self._read() as cursor:
+            await cursor.execute('SELECT user_id, username, is_main_admin FROM admins')
+            return await cursor.fetchall()
 
-    def add_user(self, user_id: int, username: str, full_name: str, phone: str):
+    async def add_user(self, user_id: int, username: str, full_name: str, phone: str):
         """Добавляет или обновляет пользователя"""
-        cursor = self.conn.cursor()
-        try:
-            # Проверяем, существует ли пользователь
-            cursor.execute('SELECT username, full_name, phone FROM users WHERE user_id = ?', (user_id,))
-            existing_user = cursor.fetchone()
-            
-            if existing_user:
-                # Обновляем только если данные изменились
-                if (existing_user[0] != username or 
-                    existing_user[1] != full_name or 
-                    existing_user[2] != phone):
-                    cursor.execute('''
-                        UPDATE users 
-                        SET username = ?, 
-                            full_name = ?, 
-                            phone = ?,
-                            last_updated = CURRENT_TIMESTAMP
-                        WHERE user_id = ?
-                    ''', (username, full_name, phone, user_id))
-                    print(f"Обновлен пользователь: {full_name} (@{username})")
-            else:
-                # Добавляем нового пользователя
-                cursor.execute('''
-                    INSERT INTO users (user_id, username, full_name, phone)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, username, full_name, phone))
-                print(f"Добавлен новый пользователь: {full_name} (@{username})")
+        async with self._write() as cursor:
+            try:
+                # Проверяем, существует ли пользователь
+                await cursor.execute('SELECT username, full_name, phone FROM users WHERE user_id = ?', (user_id,))
+                existing_user = await cursor.fetchone()
             
-            self.conn.commit()
-        except Exception as e:
-            print(f"Ошибка при добавлении/обновлении пользователя: {e}")
-            self.conn.rollback()
-            raise
+                if existing_user:
+                    # Обновляем только если данные изменились
+                    if (existing_user[0] != username or 
+                        existing_user[1] != full_name or 
+                        existing_user[2] != phone):
+                        await cursor.execute('''
+                            UPDATE users 
+                            SET username = ?, 
+                                full_name = ?, 
+                                phone = ?,
+                                last_updated = CURRENT_TIMESTAMP
+                            WHERE user_id = ?
+                        ''', (username, full_name, phone, user_id))
+                        logger.info(
+                            "Обновлен пользователь: %s (@%s)", full_name, username,
+                            extra={'event': 'user_saved', 'user_id': user_id}
+                        )
+                else:
+                    # Добавляем нового пользователя
+                    await cursor.execute('''
+                        INSERT INTO users (user_id, username, full_name, phone)
+                        VALUES (?, ?, ?, ?)
+                    ''', (user_id, username, full_name, phone))
+                    logger.info(
+                        "Добавлен новый пользователь: %s (@%s)", full_name, username,
+                        extra={'event': 'user_saved', 'user_id': user_id}
+                    )
+                    await self._log_change(cursor, 'users', user_id)
+                if not existing_user:
+                    self._user_count += 1
+            except Exception as e:
+                logger.error("Ошибка при добавлении/обновлении пользователя: %s", e)
+                raise
 
-    def get_user(self, user_id: int) -> dict:
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-        result = cursor.fetchone()
-        if result:
-            return {
-                'user_id': result[0],
-                'username': result[1],
-                'full_name': result[2],
-                'phone': result[3],
-                'created_at': result[4],
-                'last_updated': result[5]
-            }
-        return None
-
-    def get_user_by_username(self, username: str) -> dict:
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-        result = cursor.fetchone()
-        if result:
-            return {
-                'user_id': result[0],
-                'username': result[1],
-                'full_name': result[2],
-                'phone': result[3],
-                'created_at': result[4],
-                'last_updated': result[5]
-            }
-        return None
-
-    def get_all_users(self) -> list:
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users')
-        results = cursor.fetchall()
-        return [
-            {
-                'user_id': row[0],
-                'username': row[1],
-                'full_name': row[2],
-                'phone': row[3],
-                'created_at': row[4],
-                'last_updated': row[5]
-            }
-            for row in results
-        ]
+    async def get_user(self, user_id: int) -> sqlite3.Row:
+        async with self._read() as cursor:
+            await cursor.execute('SELECT user_id, username, full_name, phone, created_at, last_updated FROM users WHERE user_id = ?', (user_id,))
+            return await cursor.fetchone()
+
+    async def get_user_by_username(self, username: str) -> sqlite3.Row:
+        async with self._read() as cursor:
+            await cursor.execute('SELECT user_id, username, full_name, phone, created_at, last_updated FROM users WHERE username = ?', (username,))
+            return await cursor.fetchone()
+
+    async def get_all_users(self) -> list:
+        """Получает всех пользователей; для больших таблиц используйте iter_users"""
+        async with self._read() as cursor:
+            await cursor.execute('SELECT user_id, username, full_name, phone, created_at, last_updated FROM users')
+            return await cursor.fetchall()
+
+    async def get_users_page(self, page: int, per_page: int) -> list:
+        """Получает одну страницу пользователей вместе с флагами блокировки и роли"""
+        async with self._read() as cursor:
+            await cursor.execute('''
+                SELECT u.user_id, u.username, u.full_name, u.phone,
+                       b.user_id IS NOT NULL AS is_blocked,
+                       a.user_id IS NOT NULL AS is_admin,
+                       COALESCE(a.is_main_admin, 0) AS is_main_admin
+                FROM users u
+                LEFT JOIN blocked_users b ON b.user_id = u.user_id
+                LEFT JOIN admins a ON a.user_id = u.user_id
+                ORDER BY u.user_id
+                LIMIT ? OFFSET ?
+            ''', (per_page, (page - 1) * per_page))
+            return await cursor.fetchall()
+
+    async def get_user_stats(self) -> dict:
+        """Возвращает количество пользователей, заблокированных и администраторов"""
+        return {
+            'total': self._user_count,
+            'blocked': len(self._blocked_users),
+            'admins': len(self._admins)
+        }
+
+    async def iter_users(self, batch_size: int = 500):
+        """Порциями выдает пользователей, не загружая всю таблицу в память"""
+        after_user_id = 0
+        while True:
+            async with self._read() as cursor:
+                await cursor.execute('''
+                    SELECT user_id, username, full_name, phone, created_at, last_updated
+                    FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?
+                ''', (after_user_id, batch_size))
+                rows = await cursor.fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row
+            after_user_id = rows[-1]['user_id']
 
-    def update_user_name(self, user_id: int, full_name: str):
-        cursor = self.conn.cursor()
-        cursor.execute('UPDATE users SET full_name = ? WHERE user_id = ?', (full_name, user_id))
-        self.conn.commit()
+    async def import_users(self, users, chunk_size: int = IMPORT_CHUNK_SIZE) -> int:
+        """Загружает пользователей из итератора кортежей (user_id, username, full_name, phone)"""
+        imported = 0
+        chunk = []
+        for user in users:
+            chunk.append(user)
+            if len(chunk) >= chunk_size:
+                imported += await self._import_users_chunk(chunk)
+                chunk = []
+        if chunk:
+            imported += await self._import_users_chunk(chunk)
 
-    def update_user_phone(self, user_id: int, phone: str):
-        cursor = self.conn.cursor()
-        cursor.execute('UPDATE users SET phone = ? WHERE user_id = ?', (phone, user_id))
-        self.conn.commit()
+        # Последняя порция может быть еще не зафиксирована
+        async with self._read(fresh=True) as cursor:
+            await cursor.execute('SELECT COUNT(*) FROM users')
+            self._user_count = (await cursor.fetchone())[0]
+        return imported
 
-    def get_user_by_username_or_id(self, identifier: str) -> dict:
+    async def _import_users_chunk(self, chunk: list) -> int:
+        # Существующие записи обновляются, только если данные изменились
+        async with self._write() as cursor:
+            await cursor.executemany('''
+                INSERT INTO users (user_id, username, full_name, phone)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    username = excluded.username,
+                    full_name = excluded.full_name,
+                    phone = excluded.phone,
+                    last_updated = CURRENT_TIMESTAMP
+                WHERE users.username IS NOT excluded.username
+                   OR users.full_name IS NOT excluded.full_name
+                   OR users.phone IS NOT excluded.phone
+            ''', chunk)
+        # Каждая порция фиксируется отдельной транзакцией
+        await self.commit()
+        return len(chunk)
+
+    async def update_user_name(self, user_id: int, full_name: str):
+        async with self._write() as cursor:
+            await cursor.execute('UPDATE users SET full_name = ? WHERE user_id = ?', (full_name, user_id))
+
+    async def update_user_phone(self, user_id: int, phone: str):
+        async with self._write() as cursor:
+            await cursor.execute('UPDATE users SET phone = ? WHERE user_id = ?', (phone, user_id))
+
+    async def get_user_by_username_or_id(self, identifier: str) -> sqlite3.Row:
         """Поиск пользователя по username или ID"""
         if identifier.isdigit():
-            return self.get_user(int(identifier))
+            return await self.get_user(int(identifier))
         else:
             username = identifier.lstrip('@')  # Убираем @ если он есть
-            return self.get_user_by_username(username)
+            return await self.get_user_by_username(username)
 
-    def block_user(self, user_id: int, blocked_by: int, reason: str = None):
+    async def search_users(self, text: str, limit: int, offset: int = 0) -> list:
+        """Ищет пользователей по части имени, телефона или username, лучшие совпадения первыми"""
+        query = make_search_query(text)
+        if not query:
+            return []
+        async with self._read() as cursor:
+            await cursor.execute('''
+                SELECT u.user_id, u.username, u.full_name, u.phone
+                FROM users_fts f
+                JOIN users u ON u.user_id = f.rowid
+                WHERE users_fts MATCH ?
+                ORDER BY f.rank
+                LIMIT ? OFFSET ?
+            ''', (query, limit, offset))
+            return await cursor.fetchall()
+
+    async def search_tickets(self, text: str, limit: int, offset: int = 0) -> list:
+        """Ищет заявки по части адреса или текста, лучшие совпадения первыми"""
+        query = make_search_query(text)
+        if not query:
+            return []
+        async with self._read() as cursor:
+            await cursor.execute('''
+                SELECT t.ticket_id, t.user_id, t.kind, t.address, t.description, t.status, t.created_at
+                FROM tickets_fts f
+                JOIN tickets t ON t.ticket_id = f.rowid
+                WHERE tickets_fts MATCH ?
+                ORDER BY f.rank
+                LIMIT ? OFFSET ?
+            ''', (query, limit, offset))
+            return await cursor.fetchall()
+
+    async def block_user(self, user_id: int, blocked_by: int, reason: str = None):
         """Блокирует пользователя"""
-        cursor = self.conn.cursor()
         try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO blocked_users 
-                (user_id, blocked_by, reason) 
-                VALUES (?, ?, ?)
-            ''', (user_id, blocked_by, reason))
-            self.conn.commit()
-            print(f"Пользователь {user_id} заблокирован администратором {blocked_by}")
+            async with self._write(durable=True) as cursor:
+                await cursor.execute('''
+                    INSERT OR REPLACE INTO blocked_users 
+                    (user_id, blocked_by, reason) 
+                    VALUES (?, ?, ?)
+                ''', (user_id, blocked_by, reason))
+                await self._log_change(cursor, 'blocked_users', user_id)
+            self._blocked_users[user_id] = reason
+            logger.info("Пользователь %s заблокирован администратором %s", user_id, blocked_by)
         except Exception as e:
-            print(f"Ошибка при блокировке пользователя: {e}")
-            self.conn.rollback()
+            logger.error("Ошибка при блокировке пользователя: %s", e)
             raise
 
-    def get_block_info(self, user_id: int) -> dict:
+    async def get_block_info(self, user_id: int) -> sqlite3.Row:
         """Получает информацию о блокировке пользователя"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT b.*, u.username, u.full_name 
-            FROM blocked_users b 
-            LEFT JOIN users u ON b.blocked_by = u.user_id 
-            WHERE b.user_id = ?
-        ''', (user_id,))
-        result = cursor.fetchone()
-        if result:
-            return {
-                'user_id': result[0],
-                'blocked_at': result[1],
-                'blocked_by': result[2],
-                'reason': result[3],
-                'admin_username': result[4],
-                'admin_name': result[5]
-            }
-        return None
-
-    def get_blocked_users(self) -> list:
+        async with self._read() as cursor:
+            await cursor.execute('''
+                SELECT b.user_id, b.blocked_at, b.blocked_by, b.reason,
+                       u.username AS admin_username, u.full_name AS admin_name
+                FROM blocked_users b 
+                LEFT JOIN users u ON b.blocked_by = u.user_id 
+                WHERE b.user_id = ?
+            ''', (user_id,))
+            return await cursor.fetchone()
+
+    async def get_blocked_users(self) -> list:
         """Получает список всех заблокированных пользователей с информацией"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT b.*, u.username, u.full_name, 
-                   bu.username as blocked_username, bu.full_name as blocked_full_name
-            FROM blocked_users b 
-            LEFT JOIN users u ON b.blocked_by = u.user_id
-            LEFT JOIN users bu ON b.user_id = bu.user_id
-        ''')
-        results = cursor.fetchall()
-        return [
-            {
-                'user_id': row[0],
-                'blocked_at': row[1],
-                'blocked_by': row[2],
-                'reason': row[3],
-                'admin_username': row[4],
-                'admin_name': row[5],
-                'blocked_username': row[6],
-                'blocked_full_name': row[7]
-            }
-            for row in results
-        ]
+        async with self._read() as cursor:
+            await cursor.execute('''
+                SELECT b.user_id, b.blocked_at, b.blocked_by, b.reason,
+                       u.username AS admin_username, u.full_name AS admin_name,
+                       bu.username AS blocked_username, bu.full_name AS blocked_full_name
+                FROM blocked_users b 
+                LEFT JOIN users u ON b.blocked_by = u.user_id
+                LEFT JOIN users bu ON b.user_id = bu.user_id
+            ''')
+            return await cursor.fetchall()
 
-    def unblock_user(self, user_id: int):
+    async def unblock_user(self, user_id: int):
         """Разблокирует пользователя"""
-        cursor = self.conn.cursor()
         try:
-            cursor.execute('DELETE FROM blocked_users WHERE user_id = ?', (user_id,))
-            self.conn.commit()
-            print(f"Пользователь {user_id} разблокирован")
+            async with self._write(durable=True) as cursor:
+                await cursor.execute('DELETE FROM blocked_users WHERE user_id = ?', (user_id,))
+                await self._log_change(cursor, 'blocked_users', user_id)
+            self._blocked_users.pop(user_id, None)
+            logger.info("Пользователь %s разблокирован", user_id)
         except Exception as e:
-            print(f"Ошибка при разблокировке пользователя: {e}")
-            self.conn.rollback()
+            logger.error("Ошибка при разблокировке пользователя: %s", e)
             raise
 
-    def is_user_blocked(self, user_id: int) -> bool:
+    async def is_user_blocked(self, user_id: int) -> bool:
         """Проверяет, заблокирован ли пользователь"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT 1 FROM blocked_users WHERE user_id = ?', (user_id,))
-        return cursor.fetchone() is not None
-
-    def save_user_state(self, user_id: int, state_name: str):
-        """Сохраняет текущее состояние пользователя"""
-        cursor = self.conn.cursor()
-        cursor.execute(
-            'UPDATE users SET current_state = ?, last_updated = CURRENT_TIMESTAMP WHERE user_id = ?',
-            (state_name, user_id)
-        )
-        self.conn.commit()
-
-    def get_user_state(self, user_id: int) -> str:
-        """Получает текущее состояние пользователя"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT current_state FROM users WHERE user_id = ?', (user_id,))
-        result = cursor.fetchone()
-        return result[0] if result and result[0] else None
-
-    def clear_user_state(self, user_id: int):
-        """Очищает состояние пользователя"""
-        cursor = self.conn.cursor()
-        cursor.execute(
-            'UPDATE users SET current_state = NULL, last_updated = CURRENT_TIMESTAMP WHERE user_id = ?',
-            (user_id,)
-        )
-        self.conn.commit()
-
-    def create_test_users(self, count: int = 30):
-        """Создание тестовых пользователей"""
+        return user_id in self._blocked_users
+
+    async def get_block_reason(self, user_id: int) -> str:
+        """Возвращает причину блокировки пользователя из кэша"""
+        return self._blocked_users.get(user_id)
+
+    async def get_fsm_record(self, storage_key: str) -> tuple:
+        """Получает состояние FSM и его данные: (state, data)"""
+        async with self._read() as cursor:
+            await cursor.execute('SELECT state, data FROM fsm_states WHERE storage_key = ?', (storage_key,))
+            result = await cursor.fetchone()
+            if result:
+                return result[0], json.loads(result[1]) if result[1] else {}
+            return None, {}
+
+    async def count_fsm_states(self) -> dict:
+        """Считает сохраненные записи FSM по состояниям"""
+        async with self._read() as cursor:
+            await cursor.execute('SELECT state, COUNT(*) FROM fsm_states GROUP BY state')
+            return {row[0]: row[1] for row in await cursor.fetchall()}
+
+    async def save_fsm_records(self, records: dict):
+        """Сохраняет пачку состояний FSM одной транзакцией: {storage_key: (state, data)}"""
+        # Пустые записи удаляем, чтобы таблица не росла от завершенных диалогов
+        upserts = [
+            (key, state, json.dumps(data, ensure_ascii=False))
+            for key, (state, data) in records.items() if state is not None or data
+        ]
+        deletes = [
+            (key,) for key, (state, data) in records.items() if state is None and not data
+        ]
+        async with self._write() as cursor:
+            if upserts:
+                await cursor.executemany('''
+                    INSERT OR REPLACE INTO fsm_states (storage_key, state, data, updated_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ''', upserts)
+            if deletes:
+                await cursor.executemany('DELETE FROM fsm_states WHERE storage_key = ?', deletes)
+
+    async def create_ticket(self, user_id: int, kind: str, address: str, description: str,
+                            media_type: str = None, media_id: str = None,
+                            media_group: list = None) -> int:
+        """Сохраняет заявку и возвращает ее номер"""
+        # Номер выдает SQLite под блокировкой записи, поэтому номера заявок из
+        # разных процессов и после перезапуска не совпадают
+        async with self._write() as cursor:
+            await cursor.execute('''
+                INSERT INTO tickets (user_id, kind, address, description, media_type, media_id, media_group)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, kind, address, description, media_type, media_id,
+                  json.dumps(media_group) if media_group else None))
+            return cursor.lastrowid
+
+    async def set_ticket_admin_message(self, ticket_id: int, admin_message_id: int):
+        """Запоминает сообщение в группе администраторов, связанное с заявкой"""
+        self._write_in_background(self._update_ticket_admin_message(ticket_id, admin_message_id))
+
+    async def _update_ticket_admin_message(self, ticket_id: int, admin_message_id: int):
+        async with self._write() as cursor:
+            await cursor.execute(
+                'UPDATE tickets SET admin_message_id = ? WHERE ticket_id = ?',
+                (admin_message_id, ticket_id)
+            )
+
+    async def get_ticket(self, ticket_id: int) -> sqlite3.Row:
+        """Получает заявку по номеру"""
+        async with self._read() as cursor:
+            await cursor.execute('''
+                SELECT ticket_id, user_id, kind, address, description, media_type, media_id,
+                       media_group, status, admin_message_id, created_at
+                FROM tickets WHERE ticket_id = ?
+            ''', (ticket_id,))
+            return await cursor.fetchone()
+
+    async def get_ticket_author(self, ticket_id: int) -> dict:
+        """Находит автора заявки в формате get_relay_message"""
+        async with self._read() as cursor:
+            await cursor.execute('''
+                SELECT t.user_id, u.username, u.full_name
+                FROM tickets t LEFT JOIN users u ON u.user_id = t.user_id
+                WHERE t.ticket_id = ?
+            ''', (ticket_id,))
+            result = await cursor.fetchone()
+            if result:
+                return {
+                    'user_id': result[0],
+                    'username': result[1],
+                    'full_name': result[2],
+                    'message_id': None
+                }
+            return None
+
+    async def save_relay_message(self, admin_msg_id: int, user_id: int, username: str,
+                                 full_name: str, user_message_id: int):
+        """Связывает сообщение в группе администраторов с сообщением пользователя"""
+        self._relay_by_admin_msg.set(admin_msg_id, {
+            'user_id': user_id,
+            'username': username,
+            'full_name': full_name,
+            'message_id': user_message_id
+        })
+        self._relay_last_by_user.set(user_id, user_message_id)
+        self._write_in_background(self._insert_relay_message(
+            admin_msg_id, user_id, username, full_name, user_message_id
+        ))
+
+    async def _insert_relay_message(self, admin_msg_id: int, user_id: int, username: str,
+                                    full_name: str, user_message_id: int):
+        async with self._write() as cursor:
+            await cursor.execute('''
+                INSERT OR REPLACE INTO relay_messages
+                (admin_msg_id, user_id, username, full_name, user_message_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (admin_msg_id, user_id, username, full_name, user_message_id))
+            await self._log_change(cursor, 'relay', user_id)
+
+    async def get_relay_message(self, admin_msg_id: int) -> dict:
+        """Находит пользователя по сообщению в группе администраторов"""
+        relay = self._relay_by_admin_msg.get(admin_msg_id)
+        if relay is not None:
+            return relay
+        async with self._read() as cursor:
+            await cursor.execute(
+                'SELECT user_id, username, full_name, user_message_id FROM relay_messages WHERE admin_msg_id = ?',
+                (admin_msg_id,)
+            )
+            result = await cursor.fetchone()
+            if result:
+                relay = {
+                    'user_id': result[0],
+                    'username': result[1],
+                    'full_name': result[2],
+                    'message_id': result[3]
+                }
+                self._relay_by_admin_msg.set(admin_msg_id, relay)
+                return relay
+            return None
+
+    async def get_last_user_message_id(self, user_id: int) -> int:
+        """Получает ID последнего сообщения пользователя, переданного администраторам"""
+        message_id = self._relay_last_by_user.get(user_id)
+        if message_id is not None:
+            return message_id
+        async with self._read() as cursor:
+            await cursor.execute(
+                'SELECT user_message_id FROM relay_messages WHERE user_id = ? ORDER BY admin_msg_id DESC LIMIT 1',
+                (user_id,)
+            )
+            result = await cursor.fetchone()
+            if result:
+                self._relay_last_by_user.set(user_id, result[0])
+                return result[0]
+            return None
+
+    async def create_broadcast(self, created_by: int, payload: dict, status_chat_id: int, status_message_id: int) -> int:
+        """Сохраняет новую рассылку и возвращает ее ID"""
+        async with self._write() as cursor:
+            await cursor.execute('''
+                INSERT INTO broadcasts (created_by, payload, status_chat_id, status_message_id)
+                VALUES (?, ?, ?, ?)
+            ''', (created_by, json.dumps(payload), status_chat_id, status_message_id))
+            return cursor.lastrowid
+
+    async def get_unfinished_broadcasts(self) -> list:
+        """Получает рассылки, которые не были завершены"""
+        async with self._read() as cursor:
+            await cursor.execute('''
+                SELECT job_id, created_by, payload, status_chat_id, status_message_id
+                FROM broadcasts WHERE is_finished = 0
+            ''')
+            return [
+                {
+                    'job_id': row[0],
+                    'created_by': row[1],
+                    'payload': json.loads(row[2]),
+                    'status_chat_id': row[3],
+                    'status_message_id': row[4]
+                }
+                for row in await cursor.fetchall()
+            ]
+
+    async def iter_broadcast_recipients(self, job_id: int, exclude_user_id: int = None, batch_size: int = 500):
+        """Порциями выдает ID пользователей, которым рассылка еще не доставлялась"""
+        after_user_id = 0
+        while True:
+            async with self._read() as cursor:
+                await cursor.execute('''
+                    SELECT u.user_id FROM users u
+                    WHERE u.user_id > ?
+                      AND NOT EXISTS (
+                          SELECT 1 FROM broadcast_deliveries d
+                          WHERE d.job_id = ? AND d.user_id = u.user_id
+                      )
+                    ORDER BY u.user_id LIMIT ?
+                ''', (after_user_id, job_id, batch_size))
+                rows = await cursor.fetchall()
+            if not rows:
+                return
+            for row in rows:
+                if row[0] != exclude_user_id:
+                    yield row[0]
+            after_user_id = rows[-1][0]
+
+    async def save_broadcast_deliveries(self, job_id: int, deliveries: list):
+        """Сохраняет результаты доставки: список пар (user_id, status)"""
+        if not deliveries:
+            return
+        async with self._write() as cursor:
+            await cursor.executemany(
+                'INSERT OR REPLACE INTO broadcast_deliveries (job_id, user_id, status) VALUES (?, ?, ?)',
+                [(job_id, user_id, status) for user_id, status in deliveries]
+            )
+
+    async def get_broadcast_stats(self, job_id: int) -> dict:
+        """Считает результаты доставки рассылки по статусам"""
+        async with self._read() as cursor:
+            await cursor.execute(
+                'SELECT status, COUNT(*) FROM broadcast_deliveries WHERE job_id = ? GROUP BY status',
+                (job_id,)
+            )
+            stats = {'sent': 0, 'failed': 0, 'blocked': 0}
+            stats.update({row[0]: row[1] for row in await cursor.fetchall()})
+            return stats
+
+    async def save_dead_letter(self, method: str, chat_id, payload: str, error: str):
+        """Записывает в журнал сообщение, которое не удалось отправить"""
+        self._write_in_background(self._insert_dead_letter(method, chat_id, payload, error))
+
+    async def _insert_dead_letter(self, method: str, chat_id, payload: str, error: str):
+        async with self._write() as cursor:
+            await cursor.execute(
+                'INSERT INTO dead_letters (method, chat_id, payload, error) VALUES (?, ?, ?, ?)',
+                (method, chat_id, payload, error)
+            )
+
+    async def finish_broadcast(self, job_id: int):
+        """Отмечает рассылку как завершенную"""
+        async with self._write() as cursor:
+            await cursor.execute(
+                'UPDATE broadcasts SET is_finished = 1, finished_at = CURRENT_TIMESTAMP WHERE job_id = ?',
+                (job_id,)
+            )
+
+    async def create_test_users(self, count: int = 30, blocked_share: float = 0.2,
+                                admin_share: float = 0.1, seed: int = None):
+        """Создание тестовых пользователей, заблокированных и администраторов"""
         import random
-        import string
-        
+
         # Список случайных имен и фамилий
         first_names = ["Александр", "Дмитрий", "Максим", "Сергей", "Андрей", "Алексей", "Артём", "Илья", "Кирилл", "Михаил"]
         last_names = ["Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов", "Новиков", "Федоров"]
-        
-        # Генерация случайных пользователей
-        for _ in range(count):
-            # Генерация случайного имени
-            full_name = f"{random.choice(first_names)} {random.choice(last_names)}"
-            
-            # Генерация случайного username
-            username = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
-            
-            # Генерация случайного ID пользователя (от 1000000 до 9999999)
-            user_id = random.randint(1000000, 9999999)
-            
-            # Генерация случайного номера телефона
-            phone = f"+7{''.join(random.choices(string.digits, k=10))}"
-            
-            # Добавление пользователя в базу
-            self.add_user(user_id, username, full_name, phone)
-            
-            # Случайная блокировка некоторых пользователей
-            if random.random() < 0.2:  # 20% шанс блокировки
-                self.block_user(user_id, self.MAIN_ADMIN_ID, "Тестовая блокировка")
-            
-            # Случайное назначение некоторых пользователей как админов
-            if random.random() < 0.1:  # 10% шанс быть админом
-                self.add_admin(user_id, username, is_main_admin=False)
+        rng = random.Random(seed)
+
+        def generate_users():
+            # ID идут подряд от TEST_USER_ID_BASE, поэтому не повторяются,
+            # а username по ID позволяет найти пользователя без запроса к базе
+            for index in range(count):
+                user_id = TEST_USER_ID_BASE + index
+                full_name = f"{rng.choice(first_names)} {rng.choice(last_names)}"
+                phone = f"+7{rng.randrange(10 ** 10):010d}"
+                yield user_id, f"test{user_id}", full_name, phone
 
-    def __del__(self):
-        if hasattr(self, 'conn'):
-            self.conn.close() 
\ No newline at end of file
+        # Добавление пользователей в базу порциями
+        await self.import_users(generate_users())
+
+        # Блокировки и администраторы тоже пишутся порциями, а не отдельной
+        # транзакцией на каждого пользователя
+        blocked_by = int(MAIN_ADMIN_ID) if MAIN_ADMIN_ID else None
+        blocked, admins = [], []
+        for user_id in range(TEST_USER_ID_BASE, TEST_USER_ID_BASE + count):
+            if blocked_by and rng.random() < blocked_share:
+                blocked.append((user_id, blocked_by, "Тестовая блокировка"))
+            if rng.random() < admin_share:
+                admins.append((user_id, f"test{user_id}"))
+        for start in range(0, max(len(blocked), len(admins)), IMPORT_CHUNK_SIZE):
+            async with self._write() as cursor:
+                await cursor.executemany(
+                    'INSERT OR REPLACE INTO blocked_users (user_id, blocked_by, reason) VALUES (?, ?, ?)',
+                    blocked[start:start + IMPORT_CHUNK_SIZE]
+                )
+                await cursor.executemany(
+                    'INSERT OR IGNORE INTO admins (user_id, username) VALUES (?, ?)',
+                    admins[start:start + IMPORT_CHUNK_SIZE]
+                )
+            await self.commit()
+        await self._load_access_cache()
@@ -0,0 +1,216 @@
+import asyncio
+import html
+import json
+import logging
+import re
+from aiogram import Bot, types
+from .albums import build_media_group
+from .bottom import reply_button
+from .config import ADMIN_GROUP_ID, DIGEST_WINDOW
+from .database import Database
+
+logger = logging.getLogger(__name__)
+
+# Сколько заявок помещается в одну сводку (ограничение на кнопки и длину сообщения)
+DIGEST_MAX_TICKETS = 20
+# Сколько символов адреса и описания показывать в сводке
+DIGEST_PREVIEW_LENGTH = 80
+# Слова, которые не влияют на группировку адресов
+ADDRESS_STOP_WORDS = {
+    'г', 'город', 'ул', 'улица', 'пр', 'т', 'проспект', 'пер', 'переулок',
+    'д', 'дом', 'к', 'корп', 'корпус', 'кв', 'квартира', 'эт', 'этаж', 'под', 'подъезд'
+}
+
+
+def normalize_address(address: str) -> str:
+    """Приводит адрес к виду для группировки: без регистра, знаков и служебных слов"""
+    # Числа отделяются от букв, чтобы "д1" и "д. 1" совпадали
+    words = re.findall(r'\d+|[^\W\d_]+', (address or '').lower().replace('ё', 'е'))
+    return ' '.join(word for word in words if word not in ADDRESS_STOP_WORDS)
+
+
+def shorten(text: str) -> str:
+    """Обрезает текст до DIGEST_PREVIEW_LENGTH символов"""
+    text = text or ''
+    if len(text) > DIGEST_PREVIEW_LENGTH:
+        return text[:DIGEST_PREVIEW_LENGTH] + '…'
+    return text
+
+
+async def send_ticket(bot: Bot, ticket: dict):
+    """Отправляет заявку в группу администраторов отдельным сообщением"""
+    db = Database()
+    if ticket.get('media_group'):
+        # Альбом уходит одним запросом, но кнопку к нему прикрепить нельзя,
+        # поэтому "Ответить" отправляется отдельным сообщением
+        await bot.send_media_group(
+            ADMIN_GROUP_ID,
+            build_media_group(ticket['media_group'], ticket['admin_message'], "MarkdownV2")
+        )
+        sent_message = await bot.send_message(
+            ADMIN_GROUP_ID,
+            f"⬆️ Заявка №{ticket['ticket_id']}",
+            reply_markup=reply_button
+        )
+    elif ticket.get('media_type') == 'photo':
+        sent_message = await bot.send_photo(
+            ADMIN_GROUP_ID,
+            ticket['media_id'],
+            caption=ticket['admin_message'],
+            reply_markup=reply_button,
+            parse_mode="MarkdownV2"
+        )
+    elif ticket.get('media_type') == 'video':
+        sent_message = await bot.send_video(
+            ADMIN_GROUP_ID,
+            ticket['media_id'],
+            caption=ticket['admin_message'],
+            reply_markup=reply_button,
+            parse_mode="MarkdownV2"
+        )
+    else:
+        sent_message = await bot.send_message(
+            ADMIN_GROUP_ID,
+            ticket['admin_message'],
+            reply_markup=reply_button,
+            parse_mode="MarkdownV2"
+        )
+    await db.set_ticket_admin_message(ticket['ticket_id'], sent_message.message_id)
+    # Кнопка "Ответить" под заявкой должна находить автора
+    await db.save_relay_message(
+        admin_msg_id=sent_message.message_id,
+        user_id=ticket['user_id'],
+        username=ticket['username'],
+        full_name=ticket['full_name'],
+        user_message_id=ticket['user_message_id']
+    )
+
+
+def build_digest(tickets: list, window: float) -> tuple:
+    """Формирует сводку жалоб, сгруппированных по адресу, и кнопки к ней"""
+    groups = {}
+    for ticket in tickets:
+        groups.setdefault(normalize_address(ticket['address']), []).append(ticket)
+
+    lines = [f"<b>📋 Сводка жалоб за {window:g} с: {len(tickets)}</b>"]
+    buttons = []
+    # Сначала адреса, по которым жалоб больше всего
+    for group in sorted(groups.values(), key=len, reverse=True):
+        lines.append(f"\n📍 <b>{html.escape(shorten(group[0]['address']) or 'Не указан')}</b> — {len(group)}")
+        for ticket in group:
+            has_media = ticket.get('media_type') or ticket.get('media_group')
+            lines.append(
+                f"№{ticket['ticket_id']} {html.escape(ticket['full_name'] or '')}"
+                f"{' 📎' if has_media else ''}: {html.escape(shorten(ticket['description']))}"
+            )
+            row = [types.InlineKeyboardButton(
+                text=f"Ответить №{ticket['ticket_id']}",
+                callback_data=f"reply_ticket_{ticket['ticket_id']}"
+            )]
+            if has_media:
+                row.append(types.InlineKeyboardButton(
+                    text=f"📎 №{ticket['ticket_id']}",
+                    callback_data=f"ticket_media_{ticket['ticket_id']}"
+                ))
+            buttons.append(row)
+    return '\n'.join(lines), types.InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+async def send_ticket_media(bot: Bot, chat_id: int, ticket_id: int, reply_to: int = None):
+    """Отправляет вложения заявки из сводки по запросу администратора"""
+    ticket = await Database().get_ticket(ticket_id)
+    if not ticket or not ticket['media_type']:
+        return False
+    caption = f"Вложения к заявке №{ticket_id}"
+    if ticket['media_group']:
+        await bot.send_media_group(
+            chat_id,
+            build_media_group(json.loads(ticket['media_group']), caption),
+            reply_to_message_id=reply_to
+        )
+    elif ticket['media_type'] == 'photo':
+        await bot.send_photo(chat_id, ticket['media_id'], caption=caption, reply_to_message_id=reply_to)
+    else:
+        await bot.send_video(chat_id, ticket['media_id'], caption=caption, reply_to_message_id=reply_to)
+    return True
+
+
+class ComplaintDigest:
+    """Объединяет жалобы, пришедшие почти одновременно, в сводки для администраторов.
+
+    Первая жалоба после затишья отправляется сразу. Следующие, пришедшие в
+    течение DIGEST_WINDOW секунд, копятся и уходят одной сводкой; если за окно
+    пришла только одна жалоба, она отправляется обычным сообщением.
+    """
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ComplaintDigest, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            self.window = DIGEST_WINDOW
+            self._pending = []
+            self._window_task = None
+            # Отправка сводки, которую stop() дожидается, а не прерывает
+            self._flush_task = None
+            self._initialized = True
+
+    async def submit(self, bot: Bot, ticket: dict):
+        """Отправляет жалобу сразу или откладывает ее до сводки"""
+        if self.window <= 0:
+            await send_ticket(bot, ticket)
+            return
+        if self._window_task is not None:
+            self._pending.append(ticket)
+            return
+        self._window_task = asyncio.create_task(self._run_window(bot))
+        await send_ticket(bot, ticket)
+
+    async def _run_window(self, bot: Bot):
+        try:
+            # Пока жалобы продолжают поступать, окна идут одно за другим
+            while True:
+                await asyncio.sleep(self.window)
+                tickets, self._pending = self._pending, []
+                if not tickets:
+                    return
+                # Отправка защищена от отмены: иначе жалобы, уже забранные из
+                # очереди, пропали бы при остановке бота
+                self._flush_task = asyncio.create_task(self._flush_logged(bot, tickets))
+                await asyncio.shield(self._flush_task)
+        finally:
+            self._window_task = None
+
+    async def _flush_logged(self, bot: Bot, tickets: list):
+        try:
+            await self._flush(bot, tickets)
+        except Exception as e:
+            logger.error("Ошибка при отправке сводки жалоб: %s", e)
+
+    async def _flush(self, bot: Bot, tickets: list):
+        if len(tickets) == 1:
+            await send_ticket(bot, tickets[0])
+            return
+        db = Database()
+        for start in range(0, len(tickets), DIGEST_MAX_TICKETS):
+            chunk = tickets[start:start + DIGEST_MAX_TICKETS]
+            text, keyboard = build_digest(chunk, self.window)
+            sent_message = await bot.send_message(ADMIN_GROUP_ID, text, reply_markup=keyboard)
+            for ticket in chunk:
+                await db.set_ticket_admin_message(ticket['ticket_id'], sent_message.message_id)
+
+    async def stop(self, bot: Bot):
+        """Отправляет накопленные жалобы, не дожидаясь конца окна"""
+        if self._window_task is not None:
+            self._window_task.cancel()
+            await asyncio.gather(self._window_task, return_exceptions=True)
+        if self._flush_task is not None:
+            # Сводку, которая уже отправляется, дожидаемся до конца
+            await self._flush_task
+        tickets, self._pending = self._pending, []
+        if tickets:
+            await self._flush(bot, tickets)
@@ -2,7 +2,7 @@ from aiogram import types
 from aiogram import Dispatcher
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.filters import Command, StateFilter
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.dispatcher.middlewares.base import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 from .bottom import (
@@ -13,18 +13,25 @@ from .bottom import (
 from .config import ADMIN_GROUP_ID
 from .database import Database
 from .admin import AdminPanel, AdminStates
+from .albums import AlbumMiddleware, get_media, build_media_group
+from .digest import ComplaintDigest, send_ticket, send_ticket_media
+from .outbound import OutboundQueue
+from .profiling import UpdateProfiler
+import logging
 import os
 import re
 from aiogram import Router, F
 
+logger = logging.getLogger(__name__)
+
 class BlockedUserMiddleware(BaseMiddleware):
     async def __call__(self, handler, event, data):
         if isinstance(event, (Message, CallbackQuery)):
             user_id = event.from_user.id
             db = Database()
-            if db.is_user_blocked(user_id):
-                block_info = db.get_block_info(user_id)
-                reason = f"\nПричина: {block_info['reason']}" if block_info['reason'] else ""
+            if await db.is_user_blocked(user_id):
+                block_reason = await db.get_block_reason(user_id)
+                reason = f"\nПричина: {block_reason}" if block_reason else ""
                 if isinstance(event, Message):
                     await event.answer(f"🚫 Вы заблокированы администратором{reason}")
                 else:
@@ -58,14 +65,14 @@ def register_handlers(dp: Dispatcher):
     # Регистрируем middleware для проверки блокировки
     dp.message.middleware(BlockedUserMiddleware())
     dp.callback_query.middleware(BlockedUserMiddleware())
+    # Сообщения одного альбома обрабатываются одним вызовом
+    dp.message.middleware(AlbumMiddleware())
     
     # Инициализируем базу данных и админ-панель
     db = Database()
     admin_manager = AdminPanel()
-    
-    # Словарь для хранения последних сообщений от пользователей
-    # Формат: {admin_msg_id: {'user_id': user_id, 'username': username}}
-    last_messages = {}
+    digest = ComplaintDigest()
+    outbound = OutboundQueue()
     
     # Читаем содержимое файла contacts.txt
     with open(os.path.join(os.path.dirname(__file__), 'contacts.txt'), 'r', encoding='utf-8') as f:
@@ -94,7 +101,7 @@ def register_handlers(dp: Dispatcher):
             prev_state = previous_states[current_state]
             if prev_state is None:
                 await state.clear()
-                if admin_manager.is_admin(message.from_user.id):
+                if await admin_manager.is_admin(message.from_user.id):
                     await message.reply("Выберите нужное действие:", reply_markup=user_with_admin)
                 else:
                     await message.reply("Выберите нужное действие:", reply_markup=start_button)
@@ -130,22 +137,21 @@ def register_handlers(dp: Dispatcher):
     @dp.message(Command("start"))
     async def send_welcome(message: types.Message, state: FSMContext):
         # Проверяем, не заблокирован ли пользователь
-        if db.is_user_blocked(message.from_user.id):
-            block_info = db.get_block_info(message.from_user.id)
-            reason = f"\nПричина: {block_info['reason']}" if block_info['reason'] else ""
+        if await db.is_user_blocked(message.from_user.id):
+            block_reason = await db.get_block_reason(message.from_user.id)
+            reason = f"\nПричина: {block_reason}" if block_reason else ""
             await message.reply(f"🚫 Вы заблокированы администратором{reason}")
             return
             
         # Сначала очищаем текущее состояние пользователя
         await state.clear()
-        db.clear_user_state(message.from_user.id)
         
         # Проверяем, есть ли пользователь в базе
-        user_data = db.get_user(message.from_user.id)
+        user_data = await db.get_user(message.from_user.id)
         
         if user_data:
             # Если пользователь уже зарегистрирован
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await message.reply(
                     '✈️Добро пожаловать в главное меню чат-бота Управляющей компании "УЭР-ЮГ". Здесь Вы можете оставить заявку для управляющей компании или направить свое предложение по управлению домом. Просто воспользуйтесь кнопками меню, чтобы взаимодействовать с функциями бота:',
                     reply_markup=user_with_admin
@@ -158,12 +164,45 @@ def register_handlers(dp: Dispatcher):
         else:
             # Если пользователь новый, начинаем регистрацию
             await state.set_state(UserStates.waiting_for_name)
-            db.save_user_state(message.from_user.id, "waiting_for_name")
             await message.reply(
                 "🌞Доброго времени суток, бот создан, чтобы обрабатывать заявки и обращения пользователей. Чтобы воспользоваться этим, пришлите для начала Ваше Имя и Фамилию",
                 reply_markup=types.ReplyKeyboardRemove()
             )
 
+    # Команда доступна в любом состоянии, поэтому регистрируется до обработчиков состояний
+    @dp.message(Command("profile"))
+    async def profile_command(message: types.Message, command: CommandObject):
+        """Включает и выключает профилирование медленных обновлений: /profile [порог в секундах]"""
+        if not await admin_manager.is_admin(message.from_user.id):
+            await message.reply("❌ У вас нет прав администратора.")
+            return
+
+        profiler = UpdateProfiler()
+        if command.args:
+            try:
+                profiler.threshold = float(command.args.replace(',', '.'))
+            except ValueError:
+                await message.reply("❌ Укажите порог в секундах, например: /profile 0.5")
+                return
+            profiler.enabled = True
+        else:
+            profiler.enabled = not profiler.enabled
+
+        if profiler.enabled:
+            await message.reply(
+                f"🔬 Профилирование включено: обновления дольше {profiler.threshold:g} с "
+                f"сохраняются в {profiler.directory}"
+            )
+        else:
+            await message.reply("🔬 Профилирование выключено")
+
+    # Как и /profile, регистрируется до handle_main_menu, иначе тот перехватывает
+    # команду у администратора без состояния FSM
+    @dp.message(Command("admin"))
+    async def admin_command(message: types.Message, state: FSMContext):
+        """Обработчик команды /admin"""
+        await admin_manager.handle_admin_command(message, state)
+
     @dp.message(StateFilter(UserStates.waiting_for_name))
     async def handle_name(message: types.Message, state: FSMContext):
         # Проверяем формат имени (должно содержать хотя бы два слова)
@@ -177,7 +216,6 @@ def register_handlers(dp: Dispatcher):
 
         await state.update_data(full_name=message.text)
         await state.set_state(UserStates.waiting_for_phone)
-        db.save_user_state(message.from_user.id, "waiting_for_phone")
         await message.reply(
             "Теперь отправьте Ваш номер телефона через +7 следующим сообщением:",
             reply_markup=types.ReplyKeyboardRemove()
@@ -198,7 +236,7 @@ def register_handlers(dp: Dispatcher):
         data = await state.update_data(phone=phone)
         
         # Сохраняем пользователя в базу данных
-        db.add_user(
+        await db.add_user(
             user_id=message.from_user.id,
             username=message.from_user.username,
             full_name=data['full_name'],
@@ -206,10 +244,9 @@ def register_handlers(dp: Dispatcher):
         )
         
         await state.clear()  # Очищаем состояние для перехода в главное меню
-        db.clear_user_state(message.from_user.id)  # Очищаем состояние в БД
         
         # Проверяем, является ли пользователь администратором
-        if admin_manager.is_admin(message.from_user.id):
+        if await admin_manager.is_admin(message.from_user.id):
             await message.reply(reply_markup=user_with_admin)
         else:
             await message.reply(reply_markup=start_button)
@@ -217,95 +254,51 @@ def register_handlers(dp: Dispatcher):
     @dp.message(StateFilter(None))
     async def handle_main_menu(message: types.Message, state: FSMContext):
         if message.text == "🔑 Панель администратора":
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await message.reply("Панель администратора:", reply_markup=admin_panel)
             else:
                 await message.reply("❌ У вас нет прав администратора.")
         
         elif message.text == "🔄 Вернуться в пользовательский режим":
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await message.reply("Пользовательский режим:", reply_markup=user_with_admin)
             else:
                 await message.reply("Выберите действие:", reply_markup=start_button)
         
         elif message.text == "🔄 Вернуться в панель администратора":
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await message.reply("Панель администратора:", reply_markup=admin_panel)
             else:
                 await message.reply("❌ У вас нет прав администратора.")
         
         elif message.text == "👥 Управление админами":
-            if admin_manager.is_main_admin(message.from_user.id):
+            if await admin_manager.is_main_admin(message.from_user.id):
                 await message.reply("Управление администраторами:", reply_markup=admin_management)
             else:
                 await message.reply("❌ Только главный администратор имеет доступ к управлению администраторами.")
         
         elif message.text == "📋 Список пользователей":
-            if admin_manager.is_admin(message.from_user.id):
-                users = db.get_all_users()
-                if not users:
+            if await admin_manager.is_admin(message.from_user.id):
+                stats = await db.get_user_stats()
+                if not stats['total']:
                     await message.reply("В базе данных пока нет пользователей.")
                     return
-                
-                # Разбиваем пользователей на страницы по 20 человек
-                users_per_page = 20
-                total_pages = (len(users) + users_per_page - 1) // users_per_page
-                
-                # Создаем inline клавиатуру для навигации
-                keyboard = []
-                if total_pages > 1:
-                    # Добавляем кнопки для быстрого перехода на первую и последнюю страницу
-                    keyboard.append([
-                        types.InlineKeyboardButton(text="⏮️", callback_data="first_page"),
-                        types.InlineKeyboardButton(text="◀️", callback_data="prev_page"),
-                        types.InlineKeyboardButton(text="▶️", callback_data="next_page"),
-                        types.InlineKeyboardButton(text="⏭️", callback_data="last_page")
-                    ])
-                    
-                    # Добавляем кнопки для перехода на конкретные страницы
-                    page_buttons = []
-                    for i in range(1, total_pages + 1):
-                        if i == 1 or i == total_pages or (i >= 1 - 1 and i <= 1 + 1):
-                            page_buttons.append(types.InlineKeyboardButton(
-                                text=f"{'🔴' if i == 1 else '⚪️'} {i}",
-                                callback_data=f"page_{i}"
-                            ))
-                    
-                    # Разбиваем кнопки страниц на ряды по 5 штук
-                    for i in range(0, len(page_buttons), 5):
-                        keyboard.append(page_buttons[i:i+5])
-                
-                # Формируем заголовок с общей информацией
-                header = (
-                    f"📋 Список пользователей (Страница 1/{total_pages})\n"
-                    f"Всего: {len(users)} | "
-                    f"Заблокировано: {sum(1 for user in users if admin_manager.is_user_blocked(user['user_id']))} | "
-                    f"Админов: {sum(1 for user in users if admin_manager.is_admin(user['user_id']))}\n\n"
-                )
-                
-                # Формируем компактный список пользователей для первой страницы
-                user_list = ""
-                for user in users[:users_per_page]:
-                    status = "🚫" if admin_manager.is_user_blocked(user['user_id']) else "✅"
-                    role = "👑" if admin_manager.is_main_admin(user['user_id']) else "👤" if admin_manager.is_admin(user['user_id']) else "👥"
-                    user_list += (
-                        f"{status}{role} {user['full_name']}\n"
-                        f"ID: {user['user_id']} | "
-                        f"@{user['username'] if user['username'] else 'Нет username'} | "
-                        f"{user['phone']}\n"
-                        "-------------------\n"
-                    )
-                
-                # Отправляем сообщение с inline клавиатурой
-                await message.reply(
-                    header + user_list,
-                    reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None
-                )
+
+                text, keyboard = await build_users_page(1, stats)
+                await message.reply(text, reply_markup=keyboard)
             else:
                 await message.reply("❌ У вас нет прав администратора.")
         
+        elif message.text == "🔎 Поиск":
+            if await admin_manager.is_admin(message.from_user.id):
+                await state.set_state(AdminStates.waiting_for_search)
+                await message.reply("Введите часть имени, телефона, username или адреса:", reply_markup=types.ReplyKeyboardMarkup(
+                    keyboard=[[types.KeyboardButton(text="🔄 Вернуться в панель администратора")]],
+                    resize_keyboard=True
+                ))
+        
         elif message.text == "📢 Рассылка":
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await state.set_state(AdminStates.waiting_for_broadcast)
                 await message.reply("Введите сообщение для рассылки всем пользователям:", reply_markup=types.ReplyKeyboardMarkup(
                     keyboard=[[types.KeyboardButton(text="🔄 Вернуться в панель администратора")]],
@@ -313,7 +306,7 @@ def register_handlers(dp: Dispatcher):
                 ))
         
         elif message.text == "👤 Информация о пользователе":
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await state.set_state(AdminStates.waiting_for_user_info)
                 await message.reply("Введите username или ID пользователя:", reply_markup=types.ReplyKeyboardMarkup(
                     keyboard=[[types.KeyboardButton(text="🔄 Вернуться в панель администратора")]],
@@ -321,7 +314,7 @@ def register_handlers(dp: Dispatcher):
                 ))
         
         elif message.text == "🚫 Блокировка":
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await state.set_state(AdminStates.waiting_for_block_user)
                 await message.reply("Введите username или ID пользователя для блокировки:", reply_markup=types.ReplyKeyboardMarkup(
                     keyboard=[[types.KeyboardButton(text="🔄 Вернуться в панель администратора")]],
@@ -329,7 +322,7 @@ def register_handlers(dp: Dispatcher):
                 ))
         
         elif message.text == "✅ Разблокировка":
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await state.set_state(AdminStates.waiting_for_unblock_user)
                 await message.reply("Введите username или ID пользователя для разблокировки:", reply_markup=types.ReplyKeyboardMarkup(
                     keyboard=[[types.KeyboardButton(text="🔄 Вернуться в панель администратора")]],
@@ -337,7 +330,7 @@ def register_handlers(dp: Dispatcher):
                 ))
         
         elif message.text == "➕ Добавить администратора":
-            if admin_manager.is_main_admin(message.from_user.id):
+            if await admin_manager.is_main_admin(message.from_user.id):
                 await state.set_state(AdminStates.waiting_for_add_admin)
                 await message.reply("Введите username или ID пользователя для назначения администратором:", reply_markup=types.ReplyKeyboardMarkup(
                     keyboard=[[types.KeyboardButton(text="🔄 Вернуться в панель администратора")]],
@@ -345,13 +338,13 @@ def register_handlers(dp: Dispatcher):
                 ))
         
         elif message.text == "➖ Удалить администратора":
-            if admin_manager.is_main_admin(message.from_user.id):
+            if await admin_manager.is_main_admin(message.from_user.id):
                 await state.set_state(AdminStates.waiting_for_remove_admin)
-                admins = db.get_all_admins()
+                admins = await db.get_all_admins()
                 admin_list = "\n".join([
                     f"{'👑' if admin['is_main_admin'] else '👤'} "
                     f"ID: {admin['user_id']}"
-                    f"{f' (@{admin['username']})' if admin['username'] else ''}"
+                    f"{' (@' + admin['username'] + ')' if admin['username'] else ''}"
                     for admin in admins
                 ])
                 await message.reply(
@@ -366,19 +359,16 @@ def register_handlers(dp: Dispatcher):
         
         elif message.text == "📛Оставить заявку":
             await state.set_state(UserStates.waiting_for_application)
-            db.save_user_state(message.from_user.id, "waiting_for_application")
             await message.reply("📛👇📛Выберите категорию, по которой Вы хотите оставить заявку в УК:", reply_markup=submit_application)
         elif message.text == "📞Связаться":
             await state.set_state(UserStates.waiting_for_contact)
-            db.save_user_state(message.from_user.id, "waiting_for_contact")
             await message.reply("Выберите способ связи из нижеперечисленного списка:", reply_markup=contact_us)
         elif message.text == "⚙️Настройки":
             await state.set_state(UserStates.waiting_for_settings)
-            db.save_user_state(message.from_user.id, "waiting_for_settings")
             await message.reply("Пожалуйста, выберите опцию:", reply_markup=get_settings)
         elif message.text == "☎️Полезные контакты":
             # Отправляем контакты без изменения состояния
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await message.reply(CONTACTS_TEXT, parse_mode="MarkdownV2", reply_markup=user_with_admin)
             else:
                 await message.reply(CONTACTS_TEXT, parse_mode="MarkdownV2", reply_markup=start_button)
@@ -387,7 +377,7 @@ def register_handlers(dp: Dispatcher):
     async def handle_application(message: types.Message, state: FSMContext):
         if message.text == "📛Отправить заявку":
             # Получаем данные пользователя из базы
-            user_data = db.get_user(message.from_user.id)
+            user_data = await db.get_user(message.from_user.id)
             if user_data:
                 # Сохраняем данные пользователя в состояние
                 await state.update_data(full_name=user_data['full_name'], phone=user_data['phone'])
@@ -403,7 +393,7 @@ def register_handlers(dp: Dispatcher):
             )
         elif message.text == "💡Поделиться предложением":
             # Получаем данные пользователя из базы
-            user_data = db.get_user(message.from_user.id)
+            user_data = await db.get_user(message.from_user.id)
             if user_data:
                 # Сохраняем данные пользователя в состояние
                 await state.update_data(
@@ -422,11 +412,58 @@ def register_handlers(dp: Dispatcher):
             )
         elif message.text == "🔙Назад":
             await state.clear()
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await message.answer("Выберите действие:", reply_markup=user_with_admin)
             else:
                 await message.answer("Выберите действие:", reply_markup=start_button)
 
+    # Callback-запросы с фильтрами регистрируются раньше общего обработчика,
+    # иначе он перехватывает их первым
+    @dp.callback_query(lambda c: c.data and c.data.startswith('admin_'))
+    async def admin_callback(callback: types.CallbackQuery, state: FSMContext):
+        """Обработчик callback-запросов админ-панели"""
+        await admin_manager.handle_admin_callback(callback, state)
+
+    @dp.callback_query(lambda c: c.data in ["prev_page", "next_page", "first_page", "last_page"] or c.data.startswith("page_"))
+    async def handle_page_navigation(callback: types.CallbackQuery, state: FSMContext):
+        if not await admin_manager.is_admin(callback.from_user.id):
+            await callback.answer("❌ У вас нет прав администратора.")
+            return
+
+        # Получаем текущий текст сообщения
+        current_text = callback.message.text
+        stats = await db.get_user_stats()
+        total_pages = max(1, (stats['total'] + USERS_PER_PAGE - 1) // USERS_PER_PAGE)
+
+        # Определяем текущую страницу
+        current_page = 1
+        if "Страница" in current_text:
+            current_page = int(current_text.split("Страница")[1].split("/")[0].strip())
+
+        # Определяем новую страницу
+        if callback.data == "first_page":
+            new_page = 1
+        elif callback.data == "last_page":
+            new_page = total_pages
+        elif callback.data == "prev_page":
+            new_page = max(1, current_page - 1)
+        elif callback.data == "next_page":
+            new_page = min(total_pages, current_page + 1)
+        elif callback.data.startswith("page_"):
+            new_page = int(callback.data.split("_")[1])
+        else:
+            new_page = current_page
+
+        # Если страница не изменилась, просто отвечаем
+        if new_page == current_page:
+            await callback.answer()
+            return
+
+        # Обновляем сообщение
+        text, keyboard = await build_users_page(new_page, stats)
+        await callback.message.edit_text(text, reply_markup=keyboard)
+        await callback.answer()
+
     @dp.callback_query()
     async def handle_callback(callback: types.CallbackQuery, state: FSMContext):
         current_state = await state.get_state()
@@ -434,9 +471,9 @@ def register_handlers(dp: Dispatcher):
         if callback.data == "back":
             data = await state.get_data()
             if data.get('is_suggestion'):
-                await clear_state(callback.from_user.id, state)
+                await state.clear()
                 await callback.message.delete()
-                if admin_manager.is_admin(callback.from_user.id):
+                if await admin_manager.is_admin(callback.from_user.id):
                     await callback.message.answer("Выберите действие:", reply_markup=user_with_admin)
                 else:
                     await callback.message.answer("Выберите действие:", reply_markup=start_button)
@@ -452,7 +489,7 @@ def register_handlers(dp: Dispatcher):
                     # Возвращаемся в главное меню
                     await state.clear()
                     await callback.message.delete()
-                    if admin_manager.is_admin(callback.from_user.id):
+                    if await admin_manager.is_admin(callback.from_user.id):
                         await callback.message.answer("Выберите действие:", reply_markup=user_with_admin)
                     else:
                         await callback.message.answer("Выберите действие:", reply_markup=start_button)
@@ -506,7 +543,7 @@ def register_handlers(dp: Dispatcher):
                     reply_markup=inline_steps
                 )
             elif current_state == UserStates.waiting_for_photo:
-                await state.update_data(media_type=None, media_id=None)
+                await state.update_data(media_type=None, media_id=None, media_group=None)
                 await state.set_state(UserStates.waiting_for_description)
                 await callback.message.delete()
                 await callback.message.answer(
@@ -534,15 +571,15 @@ def register_handlers(dp: Dispatcher):
             
         elif callback.data == "phone_correct":
             # Получаем данные пользователя из базы
-            user_data = db.get_user(callback.from_user.id)
-            # Отправляем сообщение в админ группу
+            user_data = await db.get_user(callback.from_user.id)
+            # Отправляем сообщение в админ группу в фоне, не задерживая ответ пользователю
             admin_message = (
                 "📞 Запрос на звонок:\n"
                 f"Имя: {user_data['full_name']}\n"
                 f"Телефон: {user_data['phone']}\n"
                 f"Username: @{callback.from_user.username}"
             )
-            await callback.bot.send_message(chat_id=ADMIN_GROUP_ID, text=admin_message)
+            outbound.send_in_background(callback.bot.send_message(chat_id=ADMIN_GROUP_ID, text=admin_message))
             # Отвечаем пользователю
             await callback.message.edit_text(
                 "✅Отлично! Наш диспетчер перезвонит Вам в ближайшее время."
@@ -557,9 +594,13 @@ def register_handlers(dp: Dispatcher):
                 )
                 await state.set_state(UserStates.waiting_for_call_phone)
         
-        elif callback.data == "reply":
-            # Получаем информацию о пользователе из сохраненных данных
-            user_info = last_messages.get(callback.message.message_id)
+        elif callback.data == "reply" or (callback.data and callback.data.startswith("reply_ticket_")):
+            # Получаем информацию о пользователе из сохраненных данных;
+            # в сводке жалоб у каждой заявки своя кнопка с номером
+            if callback.data == "reply":
+                user_info = await db.get_relay_message(callback.message.message_id)
+            else:
+                user_info = await db.get_ticket_author(int(callback.data.split("_")[2]))
             if user_info:
                 await state.set_state(UserStates.waiting_for_reply_text)
                 await state.update_data(
@@ -576,12 +617,22 @@ def register_handlers(dp: Dispatcher):
             else:
                 await callback.answer("❌ Ошибка: информация о пользователе не найдена")
         
+        elif callback.data and callback.data.startswith("ticket_media_"):
+            if not await send_ticket_media(
+                callback.bot, callback.message.chat.id,
+                int(callback.data.split("_")[2]), callback.message.message_id
+            ):
+                await callback.answer("❌ Вложения не найдены")
+        
+        elif callback.data and callback.data.startswith("search_page_"):
+            await admin_manager.handle_search_page(callback, int(callback.data.split("_")[2]))
+        
         elif callback.data == "end_chat":
             if current_state == UserStates.in_admin_chat:
                 await state.clear()
                 await callback.message.delete()  # Удаляем сообщение с inline кнопками
                 # Показываем соответствующую клавиатуру в зависимости от статуса пользователя
-                if admin_manager.is_admin(callback.from_user.id):
+                if await admin_manager.is_admin(callback.from_user.id):
                     await callback.message.answer(
                         "✅ Диалог завершен. Выберите нужное действие:",
                         reply_markup=user_with_admin
@@ -612,7 +663,7 @@ def register_handlers(dp: Dispatcher):
         )
 
     @dp.message(StateFilter(UserStates.waiting_for_photo))
-    async def handle_photo(message: types.Message, state: FSMContext):
+    async def handle_photo(message: types.Message, state: FSMContext, album: list = None):
         if message.text == "🔙Назад":
             await state.set_state(UserStates.waiting_for_address)
             await message.answer(
@@ -622,10 +673,14 @@ def register_handlers(dp: Dispatcher):
             return
             
         if message.photo or message.video:
-            # Сохраняем медиафайл в данных состояния
-            media_type = "photo" if message.photo else "video"
-            media_id = message.photo[-1].file_id if message.photo else message.video.file_id
-            await state.update_data(media_type=media_type, media_id=media_id)
+            # Сохраняем медиафайлы в данных состояния; у альбома их несколько
+            media = [item for part in (album or [message]) for item in get_media(part)]
+            media_type, media_id = media[0]
+            await state.update_data(
+                media_type=media_type,
+                media_id=media_id,
+                media_group=media if len(media) > 1 else None
+            )
             await state.set_state(UserStates.waiting_for_description)
             await message.answer(
                 "Шаг 3/3. 📛Напишите причину обращения в подробностях:",
@@ -654,9 +709,29 @@ def register_handlers(dp: Dispatcher):
         data = await state.get_data()
         
         # Получаем данные пользователя из базы
-        user_data = db.get_user(message.from_user.id)
+        user_data = await db.get_user(message.from_user.id)
         
         if user_data:
+            # Сохраняем заявку до подтверждения, номер выдает база
+            try:
+                ticket_id = await db.create_ticket(
+                    user_id=message.from_user.id,
+                    kind='suggestion' if data.get('is_suggestion') else 'complaint',
+                    address=None if data.get('is_suggestion') else data.get('address', 'Не указан'),
+                    description=data['description'],
+                    media_type=data.get('media_type'),
+                    media_id=data.get('media_id'),
+                    media_group=data.get('media_group')
+                )
+            except Exception as e:
+                logger.error("Ошибка при сохранении заявки: %s", e)
+                await message.answer(
+                    "❌ Произошла ошибка при отправке заявки. Пожалуйста, попробуйте позже.",
+                    reply_markup=start_button
+                )
+                await state.clear()
+                return
+
             # Формируем сообщение для отправки администратору
             if data.get('is_suggestion'):
                 # Экранируем специальные символы в данных
@@ -666,7 +741,7 @@ def register_handlers(dp: Dispatcher):
                 escaped_description = escape_markdown(data['description'])
                 
                 admin_message = (
-                    "*💡Поступило новое предложение:*\n\n"
+                    f"*💡Поступило новое предложение №{ticket_id}:*\n\n"
                     f"*username:* @{escaped_username}\n"
                     f"*Имя и Фамилия:* {escaped_name}\n"
                     f"*Номер телефона:* {escaped_phone}\n"
@@ -681,7 +756,7 @@ def register_handlers(dp: Dispatcher):
                 escaped_address = escape_markdown(data.get('address', 'Не указан'))
                 
                 admin_message = (
-                    "*⛔️Поступила новая жалоба:*\n\n"
+                    f"*⛔️Поступила новая жалоба №{ticket_id}:*\n\n"
                     f"*username:* @{escaped_username}\n"
                     f"*Имя и Фамилия:* {escaped_name}\n"
                     f"*Номер телефона:* {escaped_phone}\n"
@@ -689,40 +764,36 @@ def register_handlers(dp: Dispatcher):
                     f"*Содержание:* {escaped_description}"
                 )
             
-            # Отправляем сообщение администратору
-            if data.get('media_type') == 'photo':
-                await message.bot.send_photo(
-                    ADMIN_GROUP_ID,
-                    data['media_id'],
-                    caption=admin_message,
-                    reply_markup=reply_button,
-                    parse_mode="MarkdownV2"
-                )
-            elif data.get('media_type') == 'video':
-                await message.bot.send_video(
-                    ADMIN_GROUP_ID,
-                    data['media_id'],
-                    caption=admin_message,
-                    reply_markup=reply_button,
-                    parse_mode="MarkdownV2"
-                )
+            # Отправляем заявку администраторам в фоне: лимит группы не должен
+            # задерживать подтверждение. Жалобы во время наплыва могут
+            # объединяться в сводку
+            ticket = {
+                'ticket_id': ticket_id,
+                'user_id': message.from_user.id,
+                'username': message.from_user.username,
+                'full_name': user_data['full_name'],
+                'address': data.get('address', 'Не указан'),
+                'description': data['description'],
+                'admin_message': admin_message,
+                'media_type': data.get('media_type'),
+                'media_id': data.get('media_id'),
+                'media_group': data.get('media_group'),
+                'user_message_id': message.message_id
+            }
+            if data.get('is_suggestion'):
+                outbound.send_in_background(send_ticket(message.bot, ticket))
             else:
-                await message.bot.send_message(
-                    ADMIN_GROUP_ID,
-                    admin_message,
-                    reply_markup=reply_button,
-                    parse_mode="MarkdownV2"
-                )
+                outbound.send_in_background(digest.submit(message.bot, ticket))
             
             # Отправляем подтверждение пользователю
             if data.get('is_suggestion'):
                 await message.answer(
-                    '✅💡Идея принята и передана администрации. Спасибо за Ваше обращение!',
+                    f'✅💡Идея №{ticket_id} принята и передана администрации. Спасибо за Ваше обращение!',
                     reply_markup=start_button
                 )
             else:
                 await message.answer(
-                    '✅Жалоба отправлена администрации. Спасибо за Ваше обращение!',
+                    f'✅Жалоба №{ticket_id} отправлена администрации. Спасибо за Ваше обращение!',
                     reply_markup=start_button
                 )
             
@@ -739,7 +810,7 @@ def register_handlers(dp: Dispatcher):
     async def handle_contact(message: types.Message, state: FSMContext):
         if message.text == "📞Позвоните мне":
             # Получаем данные пользователя из базы
-            user_data = db.get_user(message.from_user.id)
+            user_data = await db.get_user(message.from_user.id)
             if user_data:
                 await state.set_state(UserStates.waiting_for_call_phone)
                 await message.answer(
@@ -748,7 +819,7 @@ def register_handlers(dp: Dispatcher):
                 )
         elif message.text == "📞Свяжитесь со мной в чат-боте":
             # Получаем данные пользователя из базы
-            user_data = db.get_user(message.from_user.id)
+            user_data = await db.get_user(message.from_user.id)
             if user_data:
                 await state.update_data(
                     full_name=user_data['full_name'],
@@ -768,7 +839,7 @@ def register_handlers(dp: Dispatcher):
                 )
         elif message.text == "🔙Назад":
             await state.clear()
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await message.answer("Выберите действие:", reply_markup=user_with_admin)
             else:
                 await message.answer("Выберите действие:", reply_markup=start_button)
@@ -784,17 +855,17 @@ def register_handlers(dp: Dispatcher):
             )
             return
 
-        # Отправляем сообщение в админ группу
+        # Отправляем сообщение в админ группу в фоне, не задерживая ответ пользователю
         admin_message = (
             "📞 Запрос на звонок:\n"
             f"Имя: {(await state.get_data()).get('full_name')}\n"
             f"Телефон: {phone}\n"
             f"Username: @{message.from_user.username}"
         )
-        await message.bot.send_message(chat_id=ADMIN_GROUP_ID, text=admin_message)
+        outbound.send_in_background(message.bot.send_message(chat_id=ADMIN_GROUP_ID, text=admin_message))
         
         # Обновляем номер телефона в базе данных
-        db.update_user_phone(message.from_user.id, phone)
+        await db.update_user_phone(message.from_user.id, phone)
         
         # Отвечаем пользователю
         await message.reply(
@@ -825,7 +896,7 @@ def register_handlers(dp: Dispatcher):
             )
         elif message.text == "🔙Назад":
             await state.clear()
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await message.answer("Выберите действие:", reply_markup=user_with_admin)
             else:
                 await message.answer("Выберите действие:", reply_markup=start_button)
@@ -845,10 +916,10 @@ def register_handlers(dp: Dispatcher):
             return
 
         # Обновляем имя в базе данных
-        db.update_user_name(message.from_user.id, message.text)
+        await db.update_user_name(message.from_user.id, message.text)
         
         # Отправляем подтверждение с соответствующей клавиатурой
-        if admin_manager.is_admin(message.from_user.id):
+        if await admin_manager.is_admin(message.from_user.id):
             await message.reply(
                 "🛠✅🛠Настройки имени успешно применены!",
                 reply_markup=user_with_admin
@@ -875,10 +946,10 @@ def register_handlers(dp: Dispatcher):
             return
 
         # Обновляем номер телефона в базе данных
-        db.update_user_phone(message.from_user.id, phone)
+        await db.update_user_phone(message.from_user.id, phone)
         
         # Отправляем подтверждение с соответствующей клавиатурой
-        if admin_manager.is_admin(message.from_user.id):
+        if await admin_manager.is_admin(message.from_user.id):
             await message.reply(
                 "🛠✅🛠Настройки номера успешно применены!",
                 reply_markup=user_with_admin
@@ -894,15 +965,19 @@ def register_handlers(dp: Dispatcher):
     async def handle_contacts(message: types.Message, state: FSMContext):
         if message.text == "🔙Назад":
             await state.clear()
-            if admin_manager.is_admin(message.from_user.id):
+            if await admin_manager.is_admin(message.from_user.id):
                 await message.reply("Выберите действие:", reply_markup=user_with_admin)
             else:
                 await message.reply("Выберите действие:", reply_markup=start_button)
 
     @dp.message(StateFilter(UserStates.in_admin_chat))
-    async def handle_admin_chat(message: types.Message, state: FSMContext):
+    async def handle_admin_chat(message: types.Message, state: FSMContext, album: list = None):
         # Получаем данные пользователя
         data = await state.get_data()
+        text = message.text if message.text else ''
+        if album:
+            # Подпись альбома Telegram присылает только в одном из сообщений
+            text = next((part.caption for part in album if part.caption), '')
         
         # Формируем сообщение для админов
         admin_message = (
@@ -910,53 +985,69 @@ def register_handlers(dp: Dispatcher):
             f"От: {data.get('full_name')}\n"
             f"Телефон: {data.get('phone')}\n"
             f"Username: @{message.from_user.username}\n"
-            f"Сообщение: {message.text if message.text else ''}"
+            f"Сообщение: {text}"
         )
         
-        # Отправляем сообщение в админ группу и сохраняем его ID
-        sent_message = None
-        try:
-            if message.photo:
-                sent_message = await message.bot.send_photo(
-                    chat_id=ADMIN_GROUP_ID,
-                    photo=message.photo[-1].file_id,
-                    caption=admin_message if message.caption else None,
-                    reply_markup=reply_button
-                )
-            elif message.video:
-                sent_message = await message.bot.send_video(
-                    chat_id=ADMIN_GROUP_ID,
-                    video=message.video.file_id,
-                    caption=admin_message if message.caption else None,
-                    reply_markup=reply_button
-                )
-            else:
-                sent_message = await message.bot.send_message(
-                    chat_id=ADMIN_GROUP_ID,
-                    text=admin_message,
-                    reply_markup=reply_button
+        # Отправляем сообщение в админ группу и сохраняем его ID в фоне:
+        # лимит группы не должен задерживать подтверждение пользователю
+        async def forward_to_admins():
+            sent_message = None
+            try:
+                if album:
+                    # Альбом уходит одним запросом, кнопка "Ответить" - следующим сообщением
+                    media = [item for part in album for item in get_media(part)]
+                    await message.bot.send_media_group(
+                        chat_id=ADMIN_GROUP_ID,
+                        media=build_media_group(media)
+                    )
+                    sent_message = await message.bot.send_message(
+                        chat_id=ADMIN_GROUP_ID,
+                        text=admin_message,
+                        reply_markup=reply_button
+                    )
+                elif message.photo:
+                    sent_message = await message.bot.send_photo(
+                        chat_id=ADMIN_GROUP_ID,
+                        photo=message.photo[-1].file_id,
+                        caption=admin_message if message.caption else None,
+                        reply_markup=reply_button
+                    )
+                elif message.video:
+                    sent_message = await message.bot.send_video(
+                        chat_id=ADMIN_GROUP_ID,
+                        video=message.video.file_id,
+                        caption=admin_message if message.caption else None,
+                        reply_markup=reply_button
+                    )
+                else:
+                    sent_message = await message.bot.send_message(
+                        chat_id=ADMIN_GROUP_ID,
+                        text=admin_message,
+                        reply_markup=reply_button
+                    )
+
+                # Сохраняем информацию о сообщении
+                if sent_message:
+                    await db.save_relay_message(
+                        admin_msg_id=sent_message.message_id,
+                        user_id=message.from_user.id,
+                        username=message.from_user.username,
+                        full_name=data.get('full_name'),
+                        user_message_id=message.message_id  # Сохраняем ID сообщения пользователя
+                    )
+            except Exception as e:
+                logger.error("Ошибка при отправке сообщения: %s", e)
+                await message.reply(
+                    "❌ Произошла ошибка при отправке сообщения. Пожалуйста, попробуйте позже.",
+                    reply_markup=end_chat
                 )
-            
-            # Сохраняем информацию о сообщении
-            if sent_message:
-                last_messages[sent_message.message_id] = {
-                    'user_id': message.from_user.id,
-                    'username': message.from_user.username,
-                    'full_name': data.get('full_name'),
-                    'message_id': message.message_id  # Сохраняем ID сообщения пользователя
-                }
-            
-            # Отправляем подтверждение пользователю
-            await message.reply(
-                "✅ Ваше сообщение отправлено. Ожидайте ответа от диспетчера.",
-                reply_markup=end_chat
-            )
-        except Exception as e:
-            print(f"Ошибка при отправке сообщения: {e}")
-            await message.reply(
-                "❌ Произошла ошибка при отправке сообщения. Пожалуйста, попробуйте позже.",
-                reply_markup=end_chat
-            )
+
+        outbound.send_in_background(forward_to_admins())
+        # Отправляем подтверждение пользователю
+        await message.reply(
+            "✅ Ваше сообщение отправлено. Ожидайте ответа от диспетчера.",
+            reply_markup=end_chat
+        )
 
     @dp.message(StateFilter(UserStates.waiting_for_reply_text))
     async def handle_reply_text(message: types.Message, state: FSMContext):
@@ -972,12 +1063,8 @@ def register_handlers(dp: Dispatcher):
                 f"{message.text}"
             )
             
-            # Получаем ID сообщения пользователя из last_messages
-            user_message_id = None
-            for msg_id, msg_data in last_messages.items():
-                if msg_data.get('user_id') == user_id:
-                    user_message_id = msg_data.get('message_id')
-                    break
+            # Получаем ID последнего сообщения пользователя
+            user_message_id = await db.get_last_user_message_id(user_id)
             
             # Отправляем ответ пользователю как reply на его сообщение
             if message.photo:
@@ -1017,16 +1104,6 @@ def register_handlers(dp: Dispatcher):
             await state.clear()
 
     # Добавляем обработчики для админ-панели
-    @dp.message(Command("admin"))
-    async def admin_command(message: types.Message, state: FSMContext):
-        """Обработчик команды /admin"""
-        await admin_panel.handle_admin_command(message, state)
-
-    @dp.callback_query(lambda c: c.data and c.data.startswith('admin_'))
-    async def admin_callback(callback: types.CallbackQuery, state: FSMContext):
-        """Обработчик callback-запросов админ-панели"""
-        await admin_panel.handle_admin_callback(callback, state)
-
     @dp.message(StateFilter(AdminStates.waiting_for_broadcast))
     async def handle_broadcast(message: types.Message, state: FSMContext):
         if message.text == "🔄 Вернуться в панель администратора":
@@ -1075,6 +1152,14 @@ def register_handlers(dp: Dispatcher):
             return
         await admin_manager.handle_remove_admin(message, state)
 
+    @dp.message(StateFilter(AdminStates.waiting_for_search))
+    async def handle_search(message: types.Message, state: FSMContext):
+        if message.text == "🔄 Вернуться в панель администратора":
+            await state.clear()
+            await message.reply("Вы вернулись в панель администратора", reply_markup=admin_panel)
+            return
+        await admin_manager.handle_search(message, state)
+
     @dp.message(AdminStates.waiting_for_block_reason)
     async def handle_block_reason(message: types.Message, state: FSMContext):
         if message.text == "🔄 Вернуться в панель администратора":
@@ -1088,7 +1173,7 @@ def register_handlers(dp: Dispatcher):
         reason = None if message.text == "Пропустить" else message.text
 
         try:
-            db.block_user(user_id, message.from_user.id, reason)
+            await db.block_user(user_id, message.from_user.id, reason)
             response = f"✅ Пользователь {user_info['full_name']} (@{user_info['username']}) заблокирован."
             if reason:
                 response += f"\nПричина: {reason}"
@@ -1110,7 +1195,7 @@ def register_handlers(dp: Dispatcher):
     ])
     async def handle_main_menu_from_any_state(message: types.Message, state: FSMContext):
         # Проверяем статус пользователя
-        is_admin = admin_manager.is_admin(message.from_user.id)
+        is_admin = await admin_manager.is_admin(message.from_user.id)
         
         # Если пользователь в каком-то состоянии
         if message.text == "🔑 Панель администратора":
@@ -1140,11 +1225,6 @@ def register_handlers(dp: Dispatcher):
                 else:
                     await message.answer(CONTACTS_TEXT, parse_mode="MarkdownV2", reply_markup=start_button)
 
-    async def clear_state(user_id: int, state: FSMContext):
-        """Вспомогательная функция для очистки состояния"""
-        await state.clear()
-        db.clear_user_state(user_id)
-
     def escape_markdown(text: str) -> str:
         """Экранирование специальных символов для MarkdownV2"""
         chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
@@ -1152,59 +1232,26 @@ def register_handlers(dp: Dispatcher):
             text = text.replace(char, f'\\{char}')
         return text
 
-    @dp.callback_query(lambda c: c.data in ["prev_page", "next_page", "first_page", "last_page"] or c.data.startswith("page_"))
-    async def handle_page_navigation(callback: types.CallbackQuery, state: FSMContext):
-        if not admin_manager.is_admin(callback.from_user.id):
-            await callback.answer("❌ У вас нет прав администратора.")
-            return
+    # Количество пользователей на одной странице списка
+    USERS_PER_PAGE = 20
 
-        # Получаем текущий текст сообщения
-        current_text = callback.message.text
-        users = db.get_all_users()
-        users_per_page = 20
-        total_pages = (len(users) + users_per_page - 1) // users_per_page
-
-        # Определяем текущую страницу
-        current_page = 1
-        if "Страница" in current_text:
-            current_page = int(current_text.split("Страница")[1].split("/")[0].strip())
-
-        # Определяем новую страницу
-        if callback.data == "first_page":
-            new_page = 1
-        elif callback.data == "last_page":
-            new_page = total_pages
-        elif callback.data == "prev_page":
-            new_page = max(1, current_page - 1)
-        elif callback.data == "next_page":
-            new_page = min(total_pages, current_page + 1)
-        elif callback.data.startswith("page_"):
-            new_page = int(callback.data.split("_")[1])
-        else:
-            new_page = current_page
-
-        # Если страница не изменилась, просто отвечаем
-        if new_page == current_page:
-            await callback.answer()
-            return
-
-        # Вычисляем индексы для текущей страницы
-        start_idx = (new_page - 1) * users_per_page
-        end_idx = min(start_idx + users_per_page, len(users))
+    async def build_users_page(page: int, stats: dict):
+        """Формирует текст и клавиатуру страницы списка пользователей"""
+        total_pages = max(1, (stats['total'] + USERS_PER_PAGE - 1) // USERS_PER_PAGE)
 
         # Формируем заголовок с общей информацией
         header = (
-            f"📋 Список пользователей (Страница {new_page}/{total_pages})\n"
-            f"Всего: {len(users)} | "
-            f"Заблокировано: {sum(1 for user in users if admin_manager.is_user_blocked(user['user_id']))} | "
-            f"Админов: {sum(1 for user in users if admin_manager.is_admin(user['user_id']))}\n\n"
+            f"📋 Список пользователей (Страница {page}/{total_pages})\n"
+            f"Всего: {stats['total']} | "
+            f"Заблокировано: {stats['blocked']} | "
+            f"Админов: {stats['admins']}\n\n"
         )
 
-        # Формируем список пользователей для текущей страницы
+        # Формируем компактный список пользователей для страницы
         user_list = ""
-        for user in users[start_idx:end_idx]:
-            status = "🚫" if admin_manager.is_user_blocked(user['user_id']) else "✅"
-            role = "👑" if admin_manager.is_main_admin(user['user_id']) else "👤" if admin_manager.is_admin(user['user_id']) else "👥"
+        for user in await db.get_users_page(page, USERS_PER_PAGE):
+            status = "🚫" if user['is_blocked'] else "✅"
+            role = "👑" if user['is_main_admin'] else "👤" if user['is_admin'] else "👥"
             user_list += (
                 f"{status}{role} {user['full_name']}\n"
                 f"ID: {user['user_id']} | "
@@ -1227,9 +1274,9 @@ def register_handlers(dp: Dispatcher):
             # Добавляем кнопки для перехода на конкретные страницы
             page_buttons = []
             for i in range(1, total_pages + 1):
-                if i == 1 or i == total_pages or (i >= new_page - 1 and i <= new_page + 1):
+                if i == 1 or i == total_pages or (i >= page - 1 and i <= page + 1):
                     page_buttons.append(types.InlineKeyboardButton(
-                        text=f"{'🔴' if i == new_page else '⚪️'} {i}",
+                        text=f"{'🔴' if i == page else '⚪️'} {i}",
                         callback_data=f"page_{i}"
                     ))
             
@@ -1237,12 +1284,4 @@ def register_handlers(dp: Dispatcher):
             for i in range(0, len(page_buttons), 5):
                 keyboard.append(page_buttons[i:i+5])
 
-        # Обновляем сообщение
-        await callback.message.edit_text(
-            header + user_list,
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None
-        )
-        await callback.answer()
-
-            
-            
+        return header + user_list, types.InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None
@@ -0,0 +1,116 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from .config import LOG_LEVEL, LOG_SAMPLING
+
+# Стандартные атрибуты LogRecord; все остальные попадают в JSON как дополнительные поля
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# Данные текущего обновления: {'update_id': ..., 'user_id': ..., 'handler': ...}
+log_context = contextvars.ContextVar('log_context', default={})
+
+_listener = None
+
+
+def bind(**fields):
+    """Добавляет поля к записям журнала текущей задачи (обработки обновления)"""
+    log_context.set({**log_context.get(), **fields})
+
+
+def parse_sampling(value: str) -> dict:
+    """Разбирает настройку выборки вида update_handled=0.1,user_saved=0.5"""
+    rates = {}
+    for item in value.split(','):
+        event, _, rate = item.partition('=')
+        if event.strip() and rate.strip():
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет к записи данные обновления и отбрасывает часть частых событий"""
+
+    def __init__(self, sampling: dict):
+        super().__init__()
+        self.sampling = sampling
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Предупреждения и ошибки пишутся всегда, выборка касается только частых событий
+        rate = self.sampling.get(getattr(record, 'event', None))
+        if rate is not None and record.levelno < logging.WARNING and random.random() >= rate:
+            return False
+        for field, value in log_context.get().items():
+            if not hasattr(record, field):
+                setattr(record, field, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Записывает каждую запись одной строкой JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class JsonQueueHandler(logging.handlers.QueueHandler):
+    """Передает записи в поток журнала, сохраняя дополнительные поля"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Текст и трассировку формируем здесь: аргументы сообщения
+        # могут измениться, пока запись ждет в очереди
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level: str = LOG_LEVEL, sampling: str = LOG_SAMPLING):
+    """Настраивает журнал бота: JSON в stdout через отдельный поток записи"""
+    global _listener
+    if _listener is not None:
+        return
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    # Обработчики бота только кладут запись в очередь, вывод идет в фоновом потоке
+    queue_handler = JsonQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(ContextFilter(parse_sampling(sampling)))
+
+    logger = logging.getLogger('bot')
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Дописывает накопленные записи и останавливает поток журнала"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,25 +1,66 @@
-from aiogram import Bot, Dispatcher
-from aiogram.enums import ParseMode
-from aiogram.client.default import DefaultBotProperties
-from .config import BOT_TOKEN
-from .handlers import register_handlers
+import logging
+import time
+# Время импорта модулей (в основном aiogram) тоже входит во время запуска
+_import_started = time.perf_counter()
+from .config import RUN_MODE, WORKERS, METRICS_HOST, METRICS_PORT
+from .database import Database
+from .broadcast import Broadcaster
+from .digest import ComplaintDigest
+from .outbound import OutboundQueue
+from .app import create_bot, create_dispatcher
+from .timing import StageTimer
+from .webhook import run_webhook
+from .cluster import run_cluster
+from .monitoring import start_metrics_server
+from .logs import setup_logging
+IMPORT_TIME = time.perf_counter() - _import_started
+
+logger = logging.getLogger(__name__)
 
 async def main():
-    # Инициализация бота и диспетчера
-    bot = Bot(
-        token=BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
-    dp = Dispatcher()
+    # Журнал пишется в отдельном потоке и не задерживает обработку обновлений
+    setup_logging()
+    # В режиме нескольких процессов этот процесс только принимает
+    # обновления и раздает их процессам-обработчикам
+    if WORKERS > 1:
+        await run_cluster(WORKERS)
+        return
+
+    timer = StageTimer()
+    timer.add('импорт', IMPORT_TIME)
+    # Инициализация бота и диспетчера с обработчиками
+    bot = create_bot()
+    dp = create_dispatcher()
+    timer.mark('диспетчер')
+
+    # Подключаемся к базе данных до приема обновлений
+    db = Database()
+    await db.connect()
+    timer.mark('база данных')
 
-    # Регистрация обработчиков
-    register_handlers(dp)
+    # Возобновляем рассылки, прерванные предыдущим перезапуском
+    broadcaster = Broadcaster()
+    await broadcaster.resume_unfinished(bot)
+    timer.mark('рассылки')
+    metrics_server = await start_metrics_server(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+    logger.info("Бот готов к приему обновлений за %s", timer)
 
     try:
-        await dp.start_polling(bot)
+        if RUN_MODE == 'webhook':
+            await run_webhook(dp, bot)
+        else:
+            await dp.start_polling(bot)
     finally:
+        await broadcaster.stop()
+        # Заявки и сообщения администраторам, отправляемые в фоне, и жалобы,
+        # ожидающие сводки, отправляем до остановки
+        await OutboundQueue().wait_background()
+        await ComplaintDigest().stop(bot)
         await bot.session.close()
+        if metrics_server:
+            await metrics_server.cleanup()
+        await db.close()
 
 if __name__ == '__main__':
     import asyncio
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+import functools
+import inspect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек, в секундах
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Описания метрик: {имя: (тип, описание)}
+METRICS = {
+    'bot_updates_total': ('counter', 'Обработанные обновления по обработчику и состоянию FSM'),
+    'bot_handler_seconds': ('histogram', 'Время обработки обновления'),
+    'bot_handler_errors_total': ('counter', 'Обновления, обработка которых завершилась ошибкой'),
+    'bot_db_queries_total': ('counter', 'Вызовы методов Database'),
+    'bot_db_query_seconds': ('histogram', 'Время выполнения методов Database'),
+    'bot_telegram_requests_total': ('counter', 'Запросы к Telegram Bot API'),
+    'bot_telegram_request_seconds': ('histogram', 'Время выполнения запросов к Telegram Bot API'),
+    'bot_telegram_errors_total': ('counter', 'Ошибки запросов к Telegram Bot API'),
+    'bot_broadcast_messages_total': ('counter', 'Сообщения рассылок по результату доставки'),
+    'bot_fsm_states': ('gauge', 'Количество пользователей в каждом состоянии FSM'),
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _format_labels(labels: tuple, le: str = None) -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Metrics:
+    """Счетчики и гистограммы бота в текстовом формате Prometheus"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Metrics, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            # {имя: {метки: значение}}
+            self._values = {name: {} for name in METRICS}
+            # Функции, которые обновляют метрики перед выдачей (например, состояния FSM)
+            self._collectors = []
+            self._initialized = True
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._values[name]
+        series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        self._values[name][tuple(sorted(labels.items()))] = value
+
+    def clear(self, name: str):
+        """Удаляет все значения метрики (например, перед новым замером)"""
+        self._values[name].clear()
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._values[name]
+        histogram = series.get(key)
+        if histogram is None:
+            # Счетчики по корзинам, затем сумма и количество наблюдений
+            histogram = series[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                histogram[index] += 1
+                break
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+    def add_collector(self, collector):
+        """Регистрирует асинхронную функцию, которая обновляет метрики перед выдачей"""
+        self._collectors.append(collector)
+
+    async def render(self) -> str:
+        """Формирует текст для Prometheus"""
+        for collector in self._collectors:
+            try:
+                await collector(self)
+            except Exception as e:
+                logger.error("Ошибка при сборе метрик: %s", e)
+
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in list(self._values[name].items()):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, value):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels, bound)} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels, "+Inf")} {value[-1]}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {value[-2]}')
+                lines.append(f'{name}_count{_format_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def track_queries(cls):
+    """Считает вызовы и время выполнения публичных асинхронных методов класса"""
+    metrics = Metrics()
+
+    def wrap(name, method):
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                metrics.inc('bot_db_queries_total', method=name)
+                metrics.observe('bot_db_query_seconds', time.perf_counter() - started, method=name)
+        return wrapper
+
+    for name, method in list(vars(cls).items()):
+        if not name.startswith('_') and inspect.iscoroutinefunction(method):
+            setattr(cls, name, wrap(name, method))
+    return cls
@@ -0,0 +1,258 @@
+import logging
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+
+async def create_base_schema(cursor: aiosqlite.Cursor):
+    """Таблицы, созданные до появления миграций; для старых баз ничего не меняет"""
+    # Таблица пользователей
+    await cursor.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        full_name TEXT,
+        phone TEXT,
+        current_state TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # Проверяем наличие столбца current_state и добавляем его, если отсутствует
+    await cursor.execute("PRAGMA table_info(users)")
+    columns = [column[1] for column in await cursor.fetchall()]
+    if 'current_state' not in columns:
+        logger.info("Добавление столбца current_state в таблицу users...")
+        await cursor.execute('ALTER TABLE users ADD COLUMN current_state TEXT')
+        logger.info("Столбец current_state успешно добавлен")
+
+    # Таблица администраторов
+    await cursor.execute('''
+    CREATE TABLE IF NOT EXISTS admins (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        is_main_admin BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # Таблица заблокированных пользователей
+    await cursor.execute('''
+    CREATE TABLE IF NOT EXISTS blocked_users (
+        user_id INTEGER PRIMARY KEY,
+        blocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        blocked_by INTEGER,
+        reason TEXT,
+        FOREIGN KEY(blocked_by) REFERENCES users(user_id)
+    )
+    ''')
+
+    # Таблица заявок (жалоб и предложений)
+    await cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tickets (
+        ticket_id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        kind TEXT,
+        address TEXT,
+        description TEXT,
+        media_type TEXT,
+        media_id TEXT,
+        status TEXT DEFAULT 'new',
+        admin_message_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(user_id) REFERENCES users(user_id)
+    )
+    ''')
+    await cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_user_id ON tickets(user_id)')
+    await cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets(status)')
+    await cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_created_at ON tickets(created_at)')
+    await cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_address ON tickets(address)')
+
+    # Связь сообщений в группе администраторов с сообщениями пользователей
+    await cursor.execute('''
+    CREATE TABLE IF NOT EXISTS relay_messages (
+        admin_msg_id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        username TEXT,
+        full_name TEXT,
+        user_message_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    await cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_relay_messages_user_id ON relay_messages(user_id, admin_msg_id)'
+    )
+
+    # Состояния FSM (aiogram) пользователей
+    await cursor.execute('''
+    CREATE TABLE IF NOT EXISTS fsm_states (
+        storage_key TEXT PRIMARY KEY,
+        state TEXT,
+        data TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # Журнал изменений общих данных для процессов бота
+    await cursor.execute('''
+    CREATE TABLE IF NOT EXISTS change_log (
+        change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source INTEGER,
+        kind TEXT,
+        key INTEGER
+    )
+    ''')
+
+    # Таблица рассылок
+    await cursor.execute('''
+    CREATE TABLE IF NOT EXISTS broadcasts (
+        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_by INTEGER,
+        payload TEXT,
+        status_chat_id INTEGER,
+        status_message_id INTEGER,
+        is_finished BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+    ''')
+
+    # Результаты доставки рассылки каждому получателю
+    await cursor.execute('''
+    CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+        job_id INTEGER,
+        user_id INTEGER,
+        status TEXT,
+        delivered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY(job_id, user_id),
+        FOREIGN KEY(job_id) REFERENCES broadcasts(job_id)
+    )
+    ''')
+
+
+async def add_lookup_indexes(cursor: aiosqlite.Cursor):
+    """Индексы для поиска по @username, блокировок администратора и выборок по дате обновления"""
+    await cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)')
+    await cursor.execute('CREATE INDEX IF NOT EXISTS idx_blocked_users_blocked_by ON blocked_users(blocked_by)')
+    await cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_last_updated ON users(last_updated)')
+
+
+async def add_search_index(cursor: aiosqlite.Cursor):
+    """Полнотекстовый поиск по пользователям и заявкам, синхронизируемый триггерами"""
+    # Токенизатор trigram находит совпадение с любой частью слова или номера
+    # (от 3 символов) без учета регистра, в том числе для кириллицы
+    await cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        full_name, phone, username,
+        content='users', content_rowid='user_id', tokenize='trigram'
+    )
+    ''')
+    await cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts (rowid, full_name, phone, username)
+        VALUES (new.user_id, new.full_name, new.phone, new.username);
+    END
+    ''')
+    await cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts (users_fts, rowid, full_name, phone, username)
+        VALUES ('delete', old.user_id, old.full_name, old.phone, old.username);
+    END
+    ''')
+    await cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF full_name, phone, username ON users BEGIN
+        INSERT INTO users_fts (users_fts, rowid, full_name, phone, username)
+        VALUES ('delete', old.user_id, old.full_name, old.phone, old.username);
+        INSERT INTO users_fts (rowid, full_name, phone, username)
+        VALUES (new.user_id, new.full_name, new.phone, new.username);
+    END
+    ''')
+    await cursor.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+    await cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(
+        address, description,
+        content='tickets', content_rowid='ticket_id', tokenize='trigram'
+    )
+    ''')
+    await cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS tickets_fts_insert AFTER INSERT ON tickets BEGIN
+        INSERT INTO tickets_fts (rowid, address, description)
+        VALUES (new.ticket_id, new.address, new.description);
+    END
+    ''')
+    await cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS tickets_fts_delete AFTER DELETE ON tickets BEGIN
+        INSERT INTO tickets_fts (tickets_fts, rowid, address, description)
+        VALUES ('delete', old.ticket_id, old.address, old.description);
+    END
+    ''')
+    await cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS tickets_fts_update AFTER UPDATE OF address, description ON tickets BEGIN
+        INSERT INTO tickets_fts (tickets_fts, rowid, address, description)
+        VALUES ('delete', old.ticket_id, old.address, old.description);
+        INSERT INTO tickets_fts (rowid, address, description)
+        VALUES (new.ticket_id, new.address, new.description);
+    END
+    ''')
+    await cursor.execute("INSERT INTO tickets_fts (tickets_fts) VALUES ('rebuild')")
+
+
+async def add_ticket_media_group(cursor: aiosqlite.Cursor):
+    """Все файлы альбома, приложенного к заявке"""
+    # JSON-список [тип, file_id]; media_type и media_id хранят первый файл
+    await cursor.execute('ALTER TABLE tickets ADD COLUMN media_group TEXT')
+
+
+async def add_dead_letters(cursor: aiosqlite.Cursor):
+    """Журнал сообщений, которые не удалось отправить после всех повторов"""
+    await cursor.execute('''
+    CREATE TABLE IF NOT EXISTS dead_letters (
+        letter_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        method TEXT,
+        chat_id INTEGER,
+        payload TEXT,
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+# Миграции по порядку: (версия, описание, функция). Номер последней примененной
+# миграции хранится в PRAGMA user_version. Новые миграции добавляются в конец,
+# уже выпущенные не меняются.
+MIGRATIONS = [
+    (1, "Базовая схема", create_base_schema),
+    (2, "Индексы users.username, blocked_users.blocked_by и users.last_updated", add_lookup_indexes),
+    (3, "Полнотекстовый поиск по пользователям и заявкам", add_search_index),
+    (4, "Альбомы в заявках", add_ticket_media_group),
+    (5, "Журнал неотправленных сообщений", add_dead_letters),
+]
+
+
+async def migrate(conn: aiosqlite.Connection) -> int:
+    """Применяет недостающие миграции и возвращает версию схемы"""
+    cursor = await conn.execute('PRAGMA user_version')
+    version = (await cursor.fetchone())[0]
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        # Миграция и новый номер версии фиксируются одной транзакцией. Процессы-обработчики
+        # мигрируют базу одновременно, поэтому версия перечитывается под блокировкой
+        # записи: миграцию, уже примененную другим процессом, нельзя выполнять повторно
+        await conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = await conn.execute('PRAGMA user_version')
+            version = (await cursor.fetchone())[0]
+            if number > version:
+                logger.info("Применение миграции %s: %s", number, description)
+                cursor = await conn.cursor()
+                await apply(cursor)
+                await cursor.execute(f'PRAGMA user_version = {number}')
+                version = number
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+    return version
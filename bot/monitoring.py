@@ -0,0 +1,102 @@
+import logging
+import time
+from aiohttp import web
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from .metrics import Metrics
+from .logs import log_context, bind
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware обновлений: количество и время обработки по обработчикам"""
+
+    def __init__(self):
+        self.metrics = Metrics()
+
+    async def __call__(self, handler, event, data):
+        # Имя выбранного обработчика заполнит HandlerNameMiddleware
+        probe = data['metrics_probe'] = {'handler': 'unhandled'}
+        state = data.get('raw_state') or 'none'
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.metrics.inc('bot_handler_errors_total', handler=probe['handler'])
+            raise
+        finally:
+            self.metrics.inc('bot_updates_total', handler=probe['handler'], state=state)
+            self.metrics.observe('bot_handler_seconds', time.perf_counter() - started, handler=probe['handler'])
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Внутренний middleware: сообщает внешнему, какой обработчик выбран"""
+
+    async def __call__(self, handler, event, data):
+        name = data['handler'].callback.__name__
+        probe = data.get('metrics_probe')
+        if probe is not None:
+            probe['handler'] = name
+        bind(handler=name)
+        return await handler(event, data)
+
+
+class UpdateLoggingMiddleware(BaseMiddleware):
+    """Внешний middleware обновлений: данные обновления в записях журнала и итог обработки"""
+
+    async def __call__(self, handler, event, data):
+        user = data.get('event_from_user')
+        # Записи, сделанные при обработке, получат update_id и user_id
+        token = log_context.set({'update_id': event.update_id, 'user_id': user.id if user else None})
+        started = time.perf_counter()
+        try:
+            result = await handler(event, data)
+        except Exception:
+            logger.exception("Ошибка при обработке обновления", extra={
+                'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+            })
+            raise
+        else:
+            logger.info("Обновление обработано", extra={
+                'event': 'update_handled',
+                'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+            })
+            return result
+        finally:
+            log_context.reset(token)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Время и ошибки каждого запроса к Telegram Bot API"""
+
+    def __init__(self):
+        self.metrics = Metrics()
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            self.metrics.inc('bot_telegram_errors_total', method=name, error=type(e).__name__)
+            raise
+        finally:
+            self.metrics.inc('bot_telegram_requests_total', method=name)
+            self.metrics.observe('bot_telegram_request_seconds', time.perf_counter() - started, method=name)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """Выдает метрики в текстовом формате Prometheus"""
+    return web.Response(text=await Metrics().render(), content_type='text/plain', charset='utf-8')
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Запускает HTTP-сервер с адресом /metrics"""
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Метрики доступны на http://%s:%s/metrics", host, port)
+    return runner
@@ -0,0 +1,150 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import (
+    TelegramRetryAfter, TelegramForbiddenError, TelegramNetworkError, TelegramServerError,
+    TelegramBadRequest
+)
+from .config import ADMIN_GROUP_ID, WORKERS
+from .database import Database
+from .ratelimit import TokenBucket, ChatRateLimiter, GLOBAL_RATE, PER_CHAT_RATE, GROUP_RATE
+
+logger = logging.getLogger(__name__)
+
+# Очереди отправки по приоритету: чем меньше число, тем раньше отправка
+USER_LANE = 0
+ADMIN_LANE = 1
+BROADCAST_LANE = 2
+# Методы API, которые отправляют или меняют сообщения в чатах и идут через очередь
+QUEUED_METHODS = ('Send', 'Copy', 'Forward', 'Edit')
+# Сколько сообщений можно отправить в чат подряд без ожидания
+PRIVATE_BURST = 3
+GROUP_BURST = 5
+# Сколько раз повторять отправку после RetryAfter или сетевой ошибки
+MAX_RETRIES = 3
+
+# Очередь для запросов текущей задачи; рассылки выставляют BROADCAST_LANE
+current_lane = contextvars.ContextVar('outbound_lane', default=USER_LANE)
+
+
+class OutboundQueue(BaseRequestMiddleware):
+    """Единая очередь исходящих сообщений бота.
+
+    Общий лимит частоты выдается по приоритету: ответы пользователям,
+    затем уведомления администраторам, затем рассылки. Для каждого чата
+    действует свое ведро токенов, RetryAfter и сетевые ошибки повторяются,
+    а окончательно неотправленные сообщения попадают в журнал dead_letters.
+    """
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(OutboundQueue, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            self.db = Database()
+            # Лимиты Telegram общие для бота, поэтому делятся между процессами
+            self.bucket = TokenBucket(GLOBAL_RATE / WORKERS)
+            self.private_limiter = ChatRateLimiter(PER_CHAT_RATE, burst=PRIVATE_BURST)
+            self.group_limiter = ChatRateLimiter(GROUP_RATE / WORKERS, burst=GROUP_BURST)
+            # Ожидающие отправки: (очередь, порядковый номер, future)
+            self._queue = None
+            self._counter = itertools.count()
+            self._dispatcher = None
+            # Фоновые отправки администраторам, которых нужно дождаться при остановке
+            self._background = set()
+            self._initialized = True
+
+    async def __call__(self, make_request, bot, method):
+        if not type(method).__name__.startswith(QUEUED_METHODS):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, 'chat_id', None)
+        lane = ADMIN_LANE if str(chat_id) == str(ADMIN_GROUP_ID) else current_lane.get()
+        limiter = self._limiter_for(chat_id)
+        error = None
+        for attempt in range(MAX_RETRIES + 1):
+            if limiter is not None:
+                await limiter.acquire(chat_id)
+            await self._wait_turn(lane)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                error = e
+                if limiter is not None:
+                    limiter.pause(chat_id, e.retry_after)
+                else:
+                    await asyncio.sleep(e.retry_after)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                error = e
+                await asyncio.sleep(2 ** attempt)
+            except TelegramForbiddenError:
+                # Пользователь заблокировал бота: повторять и записывать бесполезно
+                raise
+            except TelegramBadRequest as e:
+                # Повторное редактирование тем же текстом - не потеря сообщения
+                if 'message is not modified' not in e.message:
+                    await self._dead_letter(method, chat_id, e)
+                raise
+            except Exception as e:
+                await self._dead_letter(method, chat_id, e)
+                raise
+        await self._dead_letter(method, chat_id, error)
+        raise error
+
+    def send_in_background(self, coro):
+        """Выполняет отправку в фоне, чтобы ответ пользователю не ждал лимита группы администраторов"""
+        task = asyncio.create_task(self._run_in_background(coro))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _run_in_background(self, coro):
+        try:
+            await coro
+        except Exception as e:
+            logger.error("Ошибка фоновой отправки: %s", e)
+
+    async def wait_background(self):
+        """Дожидается фоновых отправок перед остановкой бота"""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    def _limiter_for(self, chat_id):
+        if chat_id is None:
+            return None
+        if isinstance(chat_id, int) and chat_id > 0:
+            return self.private_limiter
+        return self.group_limiter
+
+    async def _wait_turn(self, lane: int):
+        """Ждет своей очереди на токен общего лимита"""
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            self._queue = asyncio.PriorityQueue()
+            self._dispatcher = asyncio.create_task(self._dispatch(self._queue))
+        turn = loop.create_future()
+        await self._queue.put((lane, next(self._counter), turn))
+        await turn
+
+    async def _dispatch(self, queue: asyncio.PriorityQueue):
+        while True:
+            _, _, turn = await queue.get()
+            if turn.done():
+                # Отправитель уже отменил ожидание
+                continue
+            await self.bucket.acquire()
+            if not turn.done():
+                turn.set_result(None)
+
+    async def _dead_letter(self, method, chat_id, error: Exception):
+        logger.warning("Не удалось выполнить %s в чат %s: %s", type(method).__name__, chat_id, error)
+        try:
+            payload = method.model_dump_json(exclude_none=True)
+        except Exception:
+            payload = repr(method)
+        await self.db.save_dead_letter(type(method).__name__, chat_id, payload, str(error))
@@ -0,0 +1,109 @@
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from .config import PROFILING, PROFILE_THRESHOLD, PROFILE_DIR, PROFILE_KEEP
+
+logger = logging.getLogger(__name__)
+
+# Сколько самых затратных функций попадает в текстовый отчет профиля
+PROFILE_REPORT_LINES = 40
+
+
+class UpdateProfiler(BaseMiddleware):
+    """Профилирует обработку обновлений и сохраняет профили медленных.
+
+    cProfile работает на весь поток, поэтому одновременно профилируется одно
+    обновление, а остальные в это время обрабатываются без замера. В профиль
+    попадает и работа других задач, выполнявшихся, пока обновление ждало ответа.
+    """
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(UpdateProfiler, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            # Включается настройкой PROFILING или командой /profile
+            self.enabled = PROFILING
+            self.threshold = PROFILE_THRESHOLD
+            root_dir = os.path.dirname(os.path.dirname(__file__))
+            self.directory = PROFILE_DIR or os.path.join(root_dir, 'profiles')
+            self._active = False
+            self._initialized = True
+
+    async def __call__(self, handler, event, data):
+        if not self.enabled or self._active:
+            return await handler(event, data)
+
+        self._active = True
+        state_before = data.get('raw_state')
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            return await handler(event, data)
+        finally:
+            profiler.disable()
+            self._active = False
+            duration = time.perf_counter() - started
+            if duration >= self.threshold:
+                await self._save(profiler, duration, event, data, state_before)
+
+    async def _save(self, profiler: cProfile.Profile, duration: float, event, data: dict, state_before: str):
+        state = data.get('state')
+        info = {
+            'update_id': data['event_update'].update_id,
+            'user_id': event.from_user.id if event.from_user else None,
+            'handler': data['handler'].callback.__name__,
+            'state_before': state_before,
+            'state_after': await state.get_state() if state else None,
+            'duration_ms': round(duration * 1000, 1)
+        }
+        try:
+            # Запись и форматирование профиля не должны блокировать цикл событий
+            path = await asyncio.to_thread(self._write, profiler, info)
+            logger.warning(
+                "Медленное обновление: %s мс в %s, профиль: %s", info['duration_ms'], info['handler'], path,
+                extra={'event': 'slow_update', 'duration_ms': info['duration_ms']}
+            )
+        except Exception as e:
+            logger.error("Ошибка при сохранении профиля: %s", e)
+
+    def _write(self, profiler: cProfile.Profile, info: dict) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{info['update_id']}-{info['handler']}"
+        path = os.path.join(self.directory, name)
+
+        # .prof открывается snakeviz или pstats, .txt читается без инструментов
+        profiler.dump_stats(path + '.prof')
+        report = io.StringIO()
+        for key, value in info.items():
+            report.write(f"{key}: {value}\n")
+        report.write('\n')
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(PROFILE_REPORT_LINES)
+        with open(path + '.txt', 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+
+        self._rotate()
+        return path + '.prof'
+
+    def _rotate(self):
+        """Удаляет старые профили сверх PROFILE_KEEP"""
+        profiles = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.prof')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in profiles[:max(0, len(profiles) - PROFILE_KEEP)]:
+            for path in (entry.path, entry.path[:-len('.prof')] + '.txt'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+# Лимиты Telegram Bot API: около 30 сообщений в секунду всего
+# и не более одного сообщения в секунду в один чат
+GLOBAL_RATE = 30
+PER_CHAT_RATE = 1
+# В группу - не более 20 сообщений в минуту
+GROUP_RATE = 20 / 60
+
+
+class TokenBucket:
+    """Ведро токенов: не более rate операций в секунду с запасом capacity"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Ждет, пока в ведре появится свободный токен, и забирает его"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ChatRateLimiter:
+    """Ограничивает частоту отправки в каждый отдельный чат.
+
+    Работает как ведро токенов на каждый чат: burst сообщений можно отправить
+    сразу, дальше - не чаще rate в секунду.
+    """
+
+    def __init__(self, rate: float = PER_CHAT_RATE, burst: int = 1, max_chats: int = 10000):
+        self.interval = 1 / rate
+        # Насколько отметка чата может опережать текущий момент без ожидания
+        self.tolerance = (burst - 1) * self.interval
+        self.max_chats = max_chats
+        # {chat_id: момент, когда ведро чата снова станет полным}
+        self._next_allowed = {}
+
+    async def acquire(self, chat_id: int):
+        """Ждет, пока в чат снова можно будет отправить сообщение"""
+        now = time.monotonic()
+        next_allowed = max(now, self._next_allowed.get(chat_id, now))
+        self._next_allowed[chat_id] = next_allowed + self.interval
+        if len(self._next_allowed) > self.max_chats:
+            self._prune(now)
+        wait = next_allowed - self.tolerance - now
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, chat_id: int, seconds: float):
+        """Запрещает отправку в чат на указанное время"""
+        self._next_allowed[chat_id] = time.monotonic() + seconds + self.tolerance
+
+    def _prune(self, now: float):
+        # Удаляем чаты, в которые уже можно отправлять без ожидания
+        self._next_allowed = {
+            chat_id: moment for chat_id, moment in self._next_allowed.items()
+            if moment > now
+        }
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from typing import Any, Dict, Mapping, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from .cache import TTLCache
+from .database import Database
+
+logger = logging.getLogger(__name__)
+
+# Как часто (в секундах) сбрасывать накопленные изменения состояний в базу
+FLUSH_INTERVAL = 0.5
+
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище FSM в базе бота с отложенной пакетной записью"""
+
+    def __init__(self):
+        self.db = Database()
+        # Записи, которые еще не попали в базу: {key: (state, data)}
+        self._dirty = {}
+        # Прочитанные из базы записи
+        self._cache = TTLCache()
+        self._flush_task = None
+
+    @staticmethod
+    def _make_key(key: StorageKey) -> str:
+        return ':'.join(str(part) for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id,
+            key.business_connection_id, key.destiny
+        ))
+
+    async def _get_record(self, key: str) -> tuple:
+        record = self._dirty.get(key)
+        if record is None:
+            record = self._cache.get(key)
+        if record is None:
+            record = await self.db.get_fsm_record(key)
+            self._cache.set(key, record)
+        return record
+
+    def _put_record(self, key: str, record: tuple):
+        self._dirty[key] = record
+        self._cache.set(key, record)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self.flush()
+
+    async def flush(self):
+        """Записывает накопленные изменения одной транзакцией"""
+        if not self._dirty:
+            return
+        records, self._dirty = self._dirty, {}
+        try:
+            await self.db.save_fsm_records(records)
+        except (Exception, asyncio.CancelledError) as e:
+            # Возвращаем записи, если их еще не перезаписали более новые
+            for key, record in records.items():
+                self._dirty.setdefault(key, record)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            logger.error("Ошибка при сохранении состояний FSM: %s", e)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self._make_key(key)
+        _, data = await self._get_record(storage_key)
+        state = state.state if isinstance(state, State) else state
+        self._put_record(storage_key, (state, data))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._get_record(self._make_key(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = self._make_key(key)
+        state, _ = await self._get_record(storage_key)
+        self._put_record(storage_key, (state, dict(data)))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._get_record(self._make_key(key))
+        return dict(data)
+
+    async def collect_metrics(self, metrics):
+        """Обновляет метрику количества пользователей в каждом состоянии"""
+        counts = await self.db.count_fsm_states()
+        metrics.clear('bot_fsm_states')
+        for state, count in counts.items():
+            metrics.set('bot_fsm_states', count, state=state or 'none')
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
@@ -0,0 +1,24 @@
+import time
+
+
+class StageTimer:
+    """Замеряет длительность последовательных этапов, например запуска бота"""
+
+    def __init__(self):
+        self.stages = {}
+        self._started = time.perf_counter()
+
+    def mark(self, stage: str):
+        """Завершает текущий этап и начинает следующий"""
+        now = time.perf_counter()
+        self.stages[stage] = now - self._started
+        self._started = now
+
+    def add(self, stage: str, seconds: float):
+        """Добавляет этап, замеренный отдельно"""
+        self.stages[stage] = seconds
+
+    def __str__(self):
+        total = sum(self.stages.values()) * 1000
+        stages = ', '.join(f"{stage} {seconds * 1000:.0f}" for stage, seconds in self.stages.items())
+        return f"{total:.0f} мс ({stages})"
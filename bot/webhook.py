@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import signal
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from .config import WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд ждать завершения уже принятых обновлений при остановке
+SHUTDOWN_TIMEOUT = 10
+
+
+class GracefulRequestHandler(SimpleRequestHandler):
+    """Обработчик webhook, который при остановке дожидается принятых обновлений"""
+
+    async def close(self) -> None:
+        if self._background_feed_update_tasks:
+            await asyncio.wait(self._background_feed_update_tasks, timeout=SHUTDOWN_TIMEOUT)
+        await super().close()
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    """Проверка работоспособности для балансировщика нагрузки"""
+    return web.json_response({'status': 'ok'})
+
+
+def create_app(dp: Dispatcher, bot: Bot) -> web.Application:
+    """Создает aiohttp-приложение, принимающее обновления от Telegram"""
+    app = web.Application()
+    app.router.add_get('/health', handle_health)
+    GracefulRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=WEBHOOK_SECRET
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Запускает webhook-сервер и работает до сигнала остановки"""
+    runner = web.AppRunner(create_app(dp, bot))
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+    logger.info("Webhook-сервер запущен на %s:%s%s", WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH)
+
+    # Без публичного адреса сервер работает локально, например для отладки
+    # записанными обновлениями, и webhook в Telegram не регистрируется
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows: остановка по Ctrl+C придет как KeyboardInterrupt
+            pass
+
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("Остановка webhook-сервера...")
+        await runner.cleanup()
@@ -1,9 +1,16 @@
+import asyncio
 from bot.database import Database
+from bot.logs import setup_logging
 
-def init_database():
+async def init_database():
     print("Инициализация базы данных...")
     db = Database()
+    # При подключении применяются недостающие миграции схемы
+    await db.connect()
+    print(f"Версия схемы базы данных: {await db.migrate()}")
+    await db.close()
     print("База данных успешно инициализирована!")
 
 if __name__ == "__main__":
-    init_database() 
\ No newline at end of file
+    setup_logging()
+    asyncio.run(init_database())
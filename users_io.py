@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+from bot.database import Database
+from bot.logs import setup_logging
+
+# Поля пользователя в файлах импорта и выгрузки
+FIELDS = ['user_id', 'username', 'full_name', 'phone', 'created_at', 'last_updated']
+
+
+def detect_format(path: str) -> str:
+    """Определяет формат файла по расширению: csv или jsonl"""
+    return 'jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.ndjson') else 'csv'
+
+
+def read_rows(path: str):
+    """Построчно читает пользователей из CSV или JSONL"""
+    with open(path, encoding='utf-8', newline='') as f:
+        if detect_format(path) == 'jsonl':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def parse_users(rows, skipped: list):
+    """Преобразует строки файла в кортежи для Database.import_users"""
+    for row in rows:
+        try:
+            user_id = int(row['user_id'])
+        except (KeyError, TypeError, ValueError):
+            skipped.append(row)
+            continue
+        yield (
+            user_id,
+            (row.get('username') or '').lstrip('@') or None,
+            row.get('full_name') or None,
+            row.get('phone') or None
+        )
+
+
+async def import_users(path: str):
+    db = Database()
+    await db.connect()
+    try:
+        skipped = []
+        imported = await db.import_users(parse_users(read_rows(path), skipped))
+        print(f"Загружено пользователей: {imported}")
+        if skipped:
+            print(f"Пропущено строк без корректного user_id: {len(skipped)}")
+    finally:
+        await db.close()
+
+
+async def export_users(path: str):
+    db = Database()
+    await db.connect()
+    try:
+        exported = 0
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            if detect_format(path) == 'jsonl':
+                async for user in db.iter_users():
+                    f.write(json.dumps(dict(user), ensure_ascii=False) + '\n')
+                    exported += 1
+            else:
+                writer = csv.DictWriter(f, fieldnames=FIELDS)
+                writer.writeheader()
+                async for user in db.iter_users():
+                    writer.writerow(dict(user))
+                    exported += 1
+        print(f"Выгружено пользователей: {exported}")
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Импорт и выгрузка пользователей в CSV или JSONL")
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('path', help="Путь к файлу .csv или .jsonl")
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.command == 'import':
+        asyncio.run(import_users(args.path))
+    else:
+        asyncio.run(export_users(args.path))